@@ -0,0 +1,272 @@
+from productgraph import iter_bits
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+
+def degeneracy_ordering(adjacency, candidates):
+    """
+        Computes a degeneracy ordering of the nodes in candidates, i.e. repeatedly removes a node of minimum degree
+        among the remaining nodes (Matula & Beck, 1983).
+
+        `Parameters`:
+            adjacency (dict: int -> int): adjacency[v] is the bitset of neighbours of node v
+            candidates (int): Bitset of the nodes to order
+
+        `Returns`:
+            ordering (list(int)): The nodes of candidates in degeneracy order
+    """
+    degrees = {v: (adjacency[v] & candidates).bit_count() for v in iter_bits(candidates)}
+    ## buckets[d] contains the remaining nodes of degree d
+    buckets = [set() for i in range(len(degrees) + 1)]
+    for v in degrees:
+        buckets[degrees[v]].add(v)
+
+    ordering = []
+    remaining = candidates
+    min_degree = 0
+    for i in range(len(degrees)):
+        ## A removal lowers degrees by at most one, so the minimum degree is at least one less than before
+        min_degree = max(min_degree - 1, 0)
+        while not buckets[min_degree]:
+            min_degree += 1
+        v = min(buckets[min_degree])
+        buckets[min_degree].remove(v)
+        ordering.append(v)
+        remaining ^= 1 << v
+        for u in iter_bits(adjacency[v] & remaining):
+            buckets[degrees[u]].remove(u)
+            degrees[u] -= 1
+            buckets[degrees[u]].add(u)
+
+    return ordering
+
+def find_cliques_bitset(adjacency, candidates, branches=None):
+    """
+        Enumerates all maximal cliques in the graph induced by candidates with the Bron-Kerbosch algorithm,
+        using Tomita pivoting in the recursion and a degeneracy ordering of the outermost level (Eppstein, Löffler & Strash, 2010).
+        All sets of nodes are bitsets over the node indices.
+
+        `Parameters`:
+            adjacency (dict: int -> int): adjacency[v] is the bitset of neighbours of node v
+            candidates (int): Bitset of the nodes of the graph to enumerate cliques in
+
+        `Optional`:
+            branches (range): Positions in the degeneracy order of the outermost branches to search, default to all of them.
+
+        `Returns`:
+            Generator of maximal cliques, each a list of node indices.
+    """
+    ## Neighbourhoods restricted to the candidates
+    neighbours = {v: adjacency[v] & candidates & ~(1 << v) for v in iter_bits(candidates)}
+
+    def expand(R, P, X):
+        if not P and not X:
+            yield R
+            return
+        ## Tomita pivot: the node in P and X with most neighbours in P, minimizing the number of branches
+        pivot = max(iter_bits(P | X), key=lambda u: (P & neighbours[u]).bit_count())
+        for v in iter_bits(P & ~neighbours[pivot]):
+            yield from expand(R + [v], P & neighbours[v], X & neighbours[v])
+            P ^= 1 << v
+            X |= 1 << v
+
+    ## Outermost level in degeneracy order: the clique of v contains v and neighbours later in the order only
+    later = candidates
+    for i, v in enumerate(degeneracy_ordering(neighbours, candidates)):
+        later ^= 1 << v
+        if branches is None or i in branches:
+            yield from expand([v], neighbours[v] & later, neighbours[v] & ~later)
+
+def coloring_bound(adjacency, nodes):
+    """
+        Computes the number of colors used by a greedy coloring of the graph induced by nodes.
+        As every node of a clique needs its own color, this is an upper bound on the size of any clique among nodes.
+    """
+    colors = 0
+    uncolored = nodes
+    while uncolored:
+        colors += 1
+        ## Color class: greedily pick pairwise non-adjacent nodes
+        available = uncolored
+        while available:
+            v = (available & -available).bit_length() - 1
+            uncolored ^= 1 << v
+            available &= ~adjacency[v] & ~(1 << v)
+    return colors
+
+def _reach_anchors(reached_anchors, frontier, anchor_bits, blue):
+    """
+        Extends the bitset of reached anchors by all anchors in the blue frontier, and the frontier by their blue neighbours,
+        until no more anchors are reached. The frontier is the bitset of nodes blue-adjacent to a reached anchor or a clique node.
+    """
+    new_anchors = frontier & anchor_bits & ~reached_anchors
+    while new_anchors:
+        reached_anchors |= new_anchors
+        for anchor in iter_bits(new_anchors):
+            frontier |= blue[anchor]
+        new_anchors = frontier & anchor_bits & ~reached_anchors
+    return reached_anchors, frontier
+
+def maximum_connected_cliques(adjacency, blue, candidates, anchors):
+    """
+        Finds all maximum cliques S among the candidates such that every node of S can be reached from anchors[0]
+        by blue edges in the graph induced by S and the anchors. These are exactly the largest extensions of the anchor
+        that connected_MCS in mcs_list_leviBarrowBurstall would report.
+
+        Branch and bound: a branch is only grown with candidates that are blue-adjacent to the anchors reached so far
+        or to the partial clique, and is cut when its size plus a greedy coloring bound on the remaining candidates cannot
+        reach the incumbent. Before the search, an incumbent is found greedily and candidates with too few neighbours
+        to be part of a clique of that size are removed (repeatedly, as removals lower degrees).
+
+        `Parameters`:
+            adjacency (dict: int -> int): adjacency[v] is the bitset of neighbours (red or blue) of candidate v
+            blue (dict: int -> int): blue[v] is the bitset of blue neighbours of node v, for candidates and anchors
+            candidates (int): Bitset of the nodes the cliques may consist of
+            anchors (list(int)): The anchor nodes, all adjacent to all candidates
+
+        `Returns`:
+            maximum_cliques (list(list(int))): All maximum cliques, each a list of node indices. 
+    """
+    anchor_bits = 0
+    for anchor in anchors:
+        anchor_bits |= 1 << anchor
+
+    def reach(reached_anchors, frontier):
+        return _reach_anchors(reached_anchors, frontier, anchor_bits, blue)
+
+    root_reached, root_frontier = reach(1 << anchors[0], blue[anchors[0]])
+
+    ## Greedy incumbent: repeatedly add the connected candidate with most neighbours among the remaining candidates
+    greedy_size = 0
+    remaining, reached_anchors, frontier = candidates, root_reached, root_frontier
+    while remaining & frontier:
+        v = max(iter_bits(remaining & frontier), key=lambda u: (adjacency[u] & remaining).bit_count())
+        greedy_size += 1
+        remaining &= adjacency[v] & ~(1 << v)
+        reached_anchors, frontier = reach(reached_anchors, frontier | blue[v])
+
+    ## Kernelization: a node of degree d is in no clique larger than d + 1
+    kernel = candidates
+    removed = True
+    while removed:
+        removed = False
+        for v in iter_bits(kernel):
+            if (adjacency[v] & kernel).bit_count() + 1 < greedy_size:
+                kernel ^= 1 << v
+                removed = True
+
+    best_size = greedy_size
+    maximum_cliques = []
+
+    def search(R, remaining, reached_anchors, frontier):
+        nonlocal best_size, maximum_cliques
+        ## Candidates that keep the clique blue-connected to the anchor
+        P = remaining & frontier
+        if not P:
+            if len(R) > best_size:
+                best_size = len(R)
+                maximum_cliques = [R]
+            elif len(R) == best_size:
+                maximum_cliques.append(R)
+            return
+
+        for v in iter_bits(P):
+            ## Ties are kept, such that all maximum cliques are found
+            if len(R) + coloring_bound(adjacency, remaining) < best_size:
+                return
+            new_reached_anchors, new_frontier = reach(reached_anchors, frontier | blue[v])
+            search(R + [v], remaining & adjacency[v] & ~(1 << v), new_reached_anchors, new_frontier)
+            ## Cliques containing v have been considered
+            remaining ^= 1 << v
+
+    search([], kernel, root_reached, root_frontier)
+
+    return maximum_cliques
+
+def find_connected_cliques(adjacency, blue, candidates, anchors, branches=None):
+    """
+        Enumerates the maximal cliques S among the candidates such that every node of S can be reached from anchors[0]
+        by blue edges in the graph induced by S and the anchors (c-cliques, Koch 2001). Instead of enumerating all maximal
+        cliques and discarding the nodes that are not blue-connected to the anchor afterwards, a clique is only grown
+        with candidates blue-adjacent to the anchors reached so far or to the clique itself.
+
+        Besides the candidates P and excluded nodes X of Bron-Kerbosch, which are adjacent to all nodes of the clique and
+        blue-connected to it, D and Y hold the candidates and excluded nodes that are adjacent to all nodes of the clique
+        but not (yet) blue-connected. They move to P and X once a blue neighbour joins the clique.
+
+        `Parameters`:
+            adjacency (dict: int -> int): adjacency[v] is the bitset of neighbours (red or blue) of candidate v
+            blue (dict: int -> int): blue[v] is the bitset of blue neighbours of node v, for candidates and anchors
+            candidates (int): Bitset of the nodes the cliques may consist of
+            anchors (list(int)): The anchor nodes, all adjacent to all candidates
+
+        `Optional`:
+            branches (range): Positions of the outermost branches to search among the candidates blue-connected to the anchor,
+                              default to all of them.
+
+        `Returns`:
+            Generator of the maximal blue-connected cliques, each a list of node indices.
+    """
+    anchor_bits = 0
+    for anchor in anchors:
+        anchor_bits |= 1 << anchor
+
+    def expand(R, P, D, X, Y, reached_anchors, frontier, branches=None):
+        if not P:
+            ## Maximal unless an excluded node could still be added
+            if not X:
+                yield R
+            return
+        for i, v in enumerate(iter_bits(P)):
+            if branches is not None and i not in branches:
+                P ^= 1 << v
+                X |= 1 << v
+                continue
+            new_reached_anchors, new_frontier = _reach_anchors(reached_anchors, frontier | blue[v], anchor_bits, blue)
+            new_candidates = (P | D) & adjacency[v] & ~(1 << v)
+            new_excluded = (X | Y) & adjacency[v]
+            yield from expand(R + [v], new_candidates & new_frontier, new_candidates & ~new_frontier,
+                              new_excluded & new_frontier, new_excluded & ~new_frontier, new_reached_anchors, new_frontier)
+            P ^= 1 << v
+            X |= 1 << v
+
+    reached_anchors, frontier = _reach_anchors(1 << anchors[0], blue[anchors[0]], anchor_bits, blue)
+    yield from expand([], candidates & frontier, candidates & ~frontier, 0, 0, reached_anchors, frontier, branches)
+
+## Arguments of the clique engine in a worker process, set once per process by _init_worker
+_worker_engine = None
+_worker_args = None
+
+def _init_worker(engine, args):
+    global _worker_engine, _worker_args
+    _worker_engine = engine
+    _worker_args = args
+
+def _search_branches(branches):
+    return list(_worker_engine(*_worker_args, branches=branches))
+
+def parallel_cliques(engine, args, branch_count, processes, chunks_per_process=8):
+    """
+        Runs a clique engine taking a `branches` keyword (find_cliques_bitset or find_connected_cliques) with its outermost branches
+        split over a pool of processes. The branches are searched in contiguous chunks, and the cliques are concatenated in chunk order,
+        such that the result is the same list as a sequential run of the engine.
+
+        `Parameters`:
+            engine (function): The clique engine
+            args (tuple): The positional arguments of the engine, sent to each process once
+            branch_count (int): An upper bound on the number of outermost branches, e.g. the number of candidates
+            processes (int): The number of worker processes
+
+        `Optional`:
+            chunks_per_process (int): The number of chunks per process. More chunks balance the uneven branch sizes better. Default to 8.
+
+        `Returns`:
+            cliques (list(list(int))): The cliques found by the engine, in the order of a sequential run.
+    """
+    chunk_size = max(1, -(-branch_count // (processes * chunks_per_process)))
+    chunks = [range(start, min(start + chunk_size, branch_count)) for start in range(0, branch_count, chunk_size)]
+    if processes <= 1 or len(chunks) <= 1:
+        return list(engine(*args))
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(engine, args)) as executor:
+        return list(chain.from_iterable(executor.map(_search_branches, chunks)))
@@ -0,0 +1,82 @@
+import numpy as np
+
+class BlockMARCS:
+    """
+    The MARCS matrix of McGregor's algorithm stored as one block per edge label. An edge of G with label `l` can only be
+    mapped to edges of H with label `l`, so row `i` of MARCS only stores the cells of the columns with the label of edge `i`,
+    and all other cells are 0. Storage, copies and updates then scale with the sum of the block sizes instead of |E_G| x |E_H|.
+    Without labels (all labels equal) there is a single block, the full matrix.
+
+    `cells`: Boolean array of the stored cells of all rows, block after block
+
+    `row_start`: row_start[i] is the position in cells of the first cell of row `i`
+
+    `row_columns`: row_columns[i] is the array of H edges of the cells of row `i`, i.e. the H edges with the label of edge `i`
+    """
+
+    def __init__(self, G_labels, H_labels):
+        """
+            Creates MARCS with every cell of the blocks 1, i.e. every edge of G may be mapped to every edge of H with its label.
+
+            `Parameters`:
+                G_labels (list: int): The label of each edge of G, the rows
+                H_labels (list: int): The label of each edge of H, the columns
+        """
+        G_labels, H_labels = np.asarray(G_labels, dtype=np.int64), np.asarray(H_labels, dtype=np.int64)
+        self.shape = (len(G_labels), len(H_labels))
+        self.row_start = np.zeros(len(G_labels), dtype=np.intp)
+        self.row_columns = [None for i in range(len(G_labels))]
+
+        size = 0
+        for label in np.unique(G_labels).tolist():
+            rows = np.flatnonzero(G_labels == label)
+            columns = np.flatnonzero(H_labels == label)
+            self.row_start[rows] = size + np.arange(len(rows)) * len(columns)
+            for row in rows.tolist():
+                self.row_columns[row] = columns
+            size += len(rows) * len(columns)
+
+        self.cells = np.ones(size, dtype=bool)
+
+    def cells_in_column(self, rows, column):
+        """
+            Returns the positions in cells of column `column` in the given rows, which must all have the label of `column`.
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        if not len(rows):
+            return np.zeros(0, dtype=np.intp)
+        return self.row_start[rows] + np.searchsorted(self.row_columns[rows[0]], column)
+
+    def row_range(self, row):
+        """
+            Returns the slice of cells holding row `row`.
+        """
+        return slice(self.row_start[row], self.row_start[row] + len(self.row_columns[row]))
+
+    def cells_of(self, rows):
+        """
+            Returns the stored cells of the given rows as (cells, positions, columns), where cells[k] is the position of a cell
+            in `cells`, positions[k] is the index in rows of its row and columns[k] is its column.
+        """
+        widths = [len(self.row_columns[row]) for row in rows]
+        cells = np.concatenate([np.arange(self.row_start[row], self.row_start[row] + width) for row, width in zip(rows, widths)] + [np.zeros(0, dtype=np.intp)])
+        positions = np.repeat(np.arange(len(rows)), widths)
+        columns = np.concatenate([self.row_columns[row] for row in rows] + [np.zeros(0, dtype=np.intp)])
+        return cells.astype(np.intp), positions, columns.astype(np.intp)
+
+    def copy(self):
+        marcs = object.__new__(BlockMARCS)
+        marcs.shape = self.shape
+        marcs.row_start = self.row_start
+        marcs.row_columns = self.row_columns
+        marcs.cells = self.cells.copy()
+        return marcs
+
+    def to_dense(self):
+        """
+            Returns MARCS as a dense boolean |E_G| x |E_H| matrix.
+        """
+        marcs = np.zeros(self.shape, dtype=bool)
+        for row in range(self.shape[0]):
+            marcs[row][self.row_columns[row]] = self.cells[self.row_range(row)]
+        return marcs
@@ -1,24 +1,32 @@
 from productgraph import product_graph_no_limit as pgnl
+from productgraph import product_graph_no_limit_vectorized as pgnlv
 from productgraph import product_graph_limit as pgl
-from linegraph import line_graph as lg
+from productgraph import ImplicitProductGraph, iter_bits, to_bits
+from bitset_cliques import find_cliques_bitset, find_connected_cliques, maximum_connected_cliques, parallel_cliques
+from linegraph import cached_line_graph as lg
 from linegraph import convert_edge_anchor_lg_list
+from edgeindex import EdgeIndex
+from preprocessing import plan_graph_order
 from itertools import chain
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import graph_format
 import networkx as nx
 import networkx.algorithms.isomorphism as iso
-from queue import Queue
 import copy
+import heapq
+import json
+import warnings
 import time
 
 
 ### Authors: Tobias Klink Lehn (toleh20@student.sdu.dk) and Kasper Halkjær Beider (kbeid20@student.sdu.dk)
-def mcs_list_leviBarrowBurstall(L, edge_anchor, limit_pg=True, molecule=False):
+def mcs_list_leviBarrowBurstall(L, edge_anchor, limit_pg=True, molecule=False, vectorized_pg=False, lazy_pg=False, compact_pg=False, clique_engine="networkx", maximum_only=False, processes=None):
     """
         Computes the Maximum Common Subgraph using the Algorithm suggested by
         G. Levi and H.G. Barrow + R.M. Burstall in 1973 and 1975 respectively.
         
         `Paramters`:
-            L (list(Graph)): A list of networkX graphs.
+            L (list(Graph)): A list of networkX graphs or CSRGraphs.
 
             edge_anchor (list: list(edge)): A valid mapping between edges in the graphs in L. An element X in the edge_anchor 
                                             is thus a list of edges, where X[i] is an edge in L[i]. All edges in X are mapped to each other.
@@ -29,6 +37,29 @@ def mcs_list_leviBarrowBurstall(L, edge_anchor, limit_pg=True, molecule=False):
             molecule (boolean): Indicates whether the graphs in L are decorated molecules (only relevant if limit_pg is true). 
                                 If true, it is expected that each graph has attribute "atom_type" on nodes and "bond_type" on edges. This further limits the tuples
                                 in the product graph. Default to false.
+
+            vectorized_pg (boolean): Indicates whether the unlimited product graph (limit_pg is false) should be computed with
+                                     NumPy adjacency matrices instead of pairwise node comparisons. Default to false.
+
+            lazy_pg (boolean): Indicates whether the product graph should be an ImplicitProductGraph, computing N, the part of N reachable
+                               from the anchor by blue edges and the edges among the anchor and that part on demand instead of
+                               materializing the product graph. Default to false.
+
+            compact_pg (boolean): Indicates whether product nodes should be stored as single integers (mixed-radix codes over the line graph
+                                  node counts) instead of tuples. Tuples are only decoded when the final edge mappings are produced. Default to false.
+
+            clique_engine (str): The algorithm enumerating the maximal cliques among the blue connected components. Either "networkx" (nx.find_cliques),
+                                 "bitset" (Bron-Kerbosch on bitsets with Tomita pivoting and degeneracy ordering) or "blue_connected". The latter only grows
+                                 cliques with nodes blue-adjacent to the anchor or the clique, and reports the maximal blue-connected extensions directly.
+                                 These are the extensions of the other engines not contained in another extension. Default to "networkx".
+
+            maximum_only (boolean): Indicates whether only the largest extensions should be returned. If true, the maximal cliques are not enumerated,
+                                    instead a branch and bound search finds the maximum blue-connected cliques directly (clique_engine is ignored). Default to false.
+
+            processes (int): The number of worker processes the clique enumeration is split over, per top-level branch of the search.
+                             The blue components cannot be searched separately, as a clique may span several components linked by red edges.
+                             Requires clique_engine "bitset" or "blue_connected", the result is the same as with a single process. Not used with
+                             maximum_only. Default to None, searching in this process.
         
         `Returns`:
         
@@ -36,8 +67,31 @@ def mcs_list_leviBarrowBurstall(L, edge_anchor, limit_pg=True, molecule=False):
                                                     following the same format as edge_anchor.
             
     """
+    return list(iter_mcs_leviBarrowBurstall(L, edge_anchor, limit_pg, molecule, vectorized_pg, lazy_pg, compact_pg, clique_engine, maximum_only, processes))
+
+def iter_mcs_leviBarrowBurstall(L, edge_anchor, limit_pg=True, molecule=False, vectorized_pg=False, lazy_pg=False, compact_pg=False, clique_engine="networkx", maximum_only=False, processes=None, spill=None):
+    """
+        Generator variant of mcs_list_leviBarrowBurstall, yielding each mapping as soon as its clique is found instead of collecting
+        all mappings in a list first. See mcs_list_leviBarrowBurstall for the parameters.
+
+        `Optional`:
+            spill (str): Path of a JSONL file each yielded mapping is also written to, one mapping per line. Default to None.
+
+        `Returns`:
+            Generator of mappings, in the same order as the list of mcs_list_leviBarrowBurstall.
+    """
+    mappings = _iter_mcs_leviBarrowBurstall(L, edge_anchor, limit_pg, molecule, vectorized_pg, lazy_pg, compact_pg, clique_engine, maximum_only, processes)
+    if spill is not None:
+        mappings = spill_mappings(mappings, spill)
+    yield from mappings
+
+def _iter_mcs_leviBarrowBurstall(L, edge_anchor, limit_pg=True, molecule=False, vectorized_pg=False, lazy_pg=False, compact_pg=False, clique_engine="networkx", maximum_only=False, processes=None):
+    """
+        Computes the mappings of iter_mcs_leviBarrowBurstall, without spilling.
+    """
+    assert not processes or maximum_only or clique_engine in ("bitset", "blue_connected"), f"processes requires clique_engine \"bitset\" or \"blue_connected\", not \"{clique_engine}\""
 
-    def blue_component_filter(PG, N, A, edge_color_lookup):
+    def blue_component_filter(PG, N, A):
         """
             Given the "blue" neighbourhood N of the anchored nodes in A in the Product Graph PG, computes a list of
             disjoint blue connected components reachable from the anchor point via blue edges. Blue connected components
@@ -47,88 +101,45 @@ def mcs_list_leviBarrowBurstall(L, edge_anchor, limit_pg=True, molecule=False):
 
             `Parameters`:
 
-                PG (Graph): A NetworkX graph, nodes are tuples of integers (u, v) but may be decorated with items
+                PG (ColoredProductGraph): A product graph with separate blue and red adjacency, nodes are referred to by their index
                 
-                N (list(node)): A list of nodes in the blue neighbourhood of A. That is, if a node is in N, it is adjacent to all nodes in A.
+                N (int): The bitset of nodes in the blue neighbourhood of A. That is, if a node is in N, it is adjacent to all nodes in A.
 
-                A (list(node)): A list of anchored nodes in PG.
-
-                edge_color_lookup (dict(edge -> str)): A dictionary mapping edges in PG to a color. The value may either be "red" or "blue"
+                A (list(int)): A list of anchored node indices in PG.
             
             `Returns`:
 
-                all_components (list( list(node) )): A list of disjoint blue connected components all reachable by blue edges from the anchor, A.
+                all_components (list( list(int) )): A list of disjoint blue connected components all reachable by blue edges from the anchor, A.
         """
-        ## BFS to find all nodes that are connected to A through blue edges
-        ## all nodes in the product graph are white in the beginning
-
-        ## Avoiding all nodes not in A and N by giving them a scary color
-        node_color_lookup = { node: "p" for node in PG.nodes}
-        for nodes in A:
-            node_color_lookup[nodes] = "w"
-        for nodes in N:
-            node_color_lookup[nodes] = "w"
-        
-        ## Starting from a node in the anchor and running BFS from that, 
-        ## modified to only look at the neighbours that can be reached via a blue edge
-        source = A[0]
-        Q = Queue()
-        Q.put(source)
-        while not Q.empty():
-            u = Q.get()
-            neighbours = PG.adj[u]
-            for v in neighbours:
-                if node_color_lookup[v] == "w":
-                    edge_color = edge_color_lookup[(u, v)] if (u, v) in edge_color_lookup else edge_color_lookup[(v, u)]                    
-                    ## Don't consider nodes that are reached by red edges
-                    if edge_color == "blue":
-                        node_color_lookup[v] = "g"
-                        Q.put(v)
-            node_color_lookup[u] = "b"
-
-        ## all nodes with a "black" color can be reached from A via blue edges. The reached nodes are either in A or N.
-        marked_nodes = [nodes for nodes in node_color_lookup if node_color_lookup[nodes] == "b"]
-        
-        ## disregard nodes in the neighbourhood not reachable by blue edges
-        filtered_N = [nodes for nodes in N if nodes in marked_nodes]
-        
-        ## Only the anchor
-        if len(filtered_N) == 0:
-            return []
+        ## BFS from A[0] to find all nodes that are connected to A through blue edges, expanding a whole layer at once
+        allowed_nodes = N | to_bits(A)
+        marked_nodes = layer = 1 << A[0]
+        while layer:
+            next_layer = 0
+            for u in iter_bits(layer):
+                next_layer |= PG.blue[u]
+            layer = next_layer & allowed_nodes & ~marked_nodes
+            marked_nodes |= layer
 
-        ## BFS on filtered nodes to find their connected components
-        ## reset color of blue nodes
-        for blue_nodes in filtered_N:
-            node_color_lookup[blue_nodes] = "w"
+        ## disregard nodes in the neighbourhood not reachable by blue edges
+        filtered_N = N & marked_nodes
 
         all_components = []
-        ## continue BFS until all components are found (i.e. when all nodes of the filtered_N have been re-colored)
-        while len(filtered_N) > 0:
-            blue_source = filtered_N.pop()
-            Q.put(blue_source)
-            ## New component consists of at least this one node from the blue neighbourhood.
-            current_component = [blue_source]        
-            while not Q.empty():
-                u = Q.get()
-                neighbours = PG.adj[u]
-                for v in neighbours:
-                    if node_color_lookup[v] == "w":
-                        edge_color = edge_color_lookup[(u, v)] if (u, v) in edge_color_lookup else edge_color_lookup[(v, u)]
-                        
-                        ## Don't consider nodes that are reached by red edges
-                        if edge_color == "blue":
-                            node_color_lookup[v] = "g"
-                            current_component.append(v)
-                            Q.put(v)
-                node_color_lookup[u] = "b"
-            ## remaining blue neighbours who haven't built their own component yet. 
-            filtered_N = [nodes for nodes in filtered_N if node_color_lookup[nodes] == "w"]
+        ## BFS on the filtered nodes to find their connected components, each starting from the last remaining node
+        while filtered_N:
+            blue_source = filtered_N.bit_length() - 1
+            filtered_N ^= 1 << blue_source
+            current_component = [blue_source]
+            ## current_component doubles as the queue of the BFS
+            for u in current_component:
+                blue_neighbours = PG.blue[u] & filtered_N
+                current_component.extend(iter_bits(blue_neighbours))
+                filtered_N ^= blue_neighbours
             all_components.append(current_component)
-            current_component = []
 
         return all_components
 
-    def connected_MCS(listN, PG, A, edge_color_lookup):
+    def connected_MCS(listN, PG, A):
         """
             Implementation of Algorithm 1 as suggested by Akbar Davoodi.
 
@@ -136,92 +147,146 @@ def mcs_list_leviBarrowBurstall(L, edge_anchor, limit_pg=True, molecule=False):
             in the graph induced by A and a specific clique are removed, and the remaining nodes in the clique
             is unioned with the anchor as an extension.
         """
-        MCSs = []
-        ## Create node induced subgraph of the modular product graph containing all blue connected components
-        blue_component_graph = nx.Graph(nx.induced_subgraph(PG, chain(*listN)))
-
-        component_cliques = list(nx.find_cliques(blue_component_graph))
-
-        ## For each clique, create the induced subgraph concatenated with the anchor
-        ## do BFS on this new graph, removing all nodes that are not reachable by a blue edge from the anchor
-        for comp_clique in component_cliques:          
-            bfs_graph = nx.Graph(nx.induced_subgraph(PG, A + comp_clique))
-            node_color_lookup = {node: 'w' for node in bfs_graph.nodes}
-            edge_color_lookup = nx.get_edge_attributes(bfs_graph, "color")
-            source = A[0]
-            Q = Queue()
-            Q.put(source)
-            while not Q.empty():
-                u = Q.get()
-                neighbours = bfs_graph.adj[u]
-                for v in neighbours:
-                    if node_color_lookup[v] == "w":
-                        edge_color = edge_color_lookup[(u, v)] if (u, v) in edge_color_lookup else edge_color_lookup[(v, u)]                    
-                        ## Don't consider nodes that are reached by red edges
-                        if edge_color == "blue":
-                            node_color_lookup[v] = "g"
-                            Q.put(v)
-                node_color_lookup[u] = "b"
-            
-            ## 
-            reachable_nodes = [node for node in comp_clique if node_color_lookup[node] == 'b']
-            MCSs.append(reachable_nodes + A)
+        ## The nodes of all blue connected components as a bitset, and their neighbourhoods in PG
+        component_nodes = to_bits(chain(*listN))
+        adjacency = {node: PG.neighbours(node) for node in iter_bits(component_nodes)}
+
+        ## The maximum cliques are blue-connected to the anchor by construction, no BFS is needed
+        if maximum_only:
+            for clique in maximum_connected_cliques(adjacency, PG.blue, component_nodes, A):
+                yield clique + A
+            return
 
+        ## The extensions are blue-connected to the anchor by construction, no BFS is needed
+        if clique_engine == "blue_connected":
+            if processes:
+                connected_cliques = parallel_cliques(find_connected_cliques, (adjacency, PG.blue, component_nodes, A),
+                                                     component_nodes.bit_count(), processes)
+            else:
+                connected_cliques = find_connected_cliques(adjacency, PG.blue, component_nodes, A)
+            for clique in connected_cliques:
+                yield clique + A
+            return
 
-        return MCSs
+        if clique_engine == "bitset":
+            if processes:
+                component_cliques = parallel_cliques(find_cliques_bitset, (adjacency, component_nodes), component_nodes.bit_count(), processes)
+            else:
+                component_cliques = find_cliques_bitset(adjacency, component_nodes)
+        else:
+            ## Create node induced subgraph of the modular product graph containing all blue connected components
+            ## The nodes are product node tuples in the order of the NetworkX product graph, as nx.find_cliques depends on it
+            blue_component_graph = nx.Graph(nx.induced_subgraph(PG.to_networkx(), [PG.nodes[node] for node in chain(*listN)]))
+            component_cliques = ([PG.index_of(node) for node in clique] for clique in nx.find_cliques(blue_component_graph))
+
+        ## For each clique, consider the subgraph induced by the clique and the anchor.
+        ## do BFS on this subgraph, removing all nodes that are not reachable by a blue edge from the anchor.
+        ## The BFS expands a whole layer of the search at once, as a bitset.
+        anchor_bits = to_bits(A)
+        for comp_clique in component_cliques:
+            allowed_nodes = anchor_bits | to_bits(comp_clique)
+            marked_nodes = layer = 1 << A[0]
+            while layer:
+                next_layer = 0
+                for u in iter_bits(layer):
+                    next_layer |= PG.blue[u]
+                layer = next_layer & allowed_nodes & ~marked_nodes
+                marked_nodes |= layer
+
+            reachable_nodes = [node for node in comp_clique if marked_nodes >> node & 1]
+            yield reachable_nodes + A
 
     n_graphs = len(L)
-    edge_lists = [list(L[i].edges) for i in range(n_graphs)]
+    edge_indices = [EdgeIndex(L[i]) for i in range(n_graphs)]
 
     linegraphs = [lg(L[i], molecule=molecule) for i in range(n_graphs)]
 
     ## List of anchor nodes in the linegraphs
-    computed_node_anchor = convert_edge_anchor_lg_list(L, edge_anchor)
+    computed_node_anchor = convert_edge_anchor_lg_list(L, edge_anchor, edge_indices)
     ## Unfold anchor nodes in the modular product graph
     anchor_nodes =  [ tuple(v) for v in computed_node_anchor]
     
     ## Compute product graph, either constraining it to only include A and N, or include all possible nodes.
-    mod_product_graph = pgl(linegraphs, anchor_nodes, molecule=molecule) if limit_pg else pgnl(linegraphs)
-
-    ## If no nodes are added, |anchor| = 1 and N = Ø. If product graph only contains 
-    ## anchor nodes (|anchor| >= 2), then N = Ø.
-    if not mod_product_graph.nodes or anchor_nodes == mod_product_graph.nodes:
-        return [edge_anchor]
+    ## The implicit product graph computes N without the product of all node sets, and then only the part of N reachable from
+    ## A by blue edges, which is all the search visits, and the edges within it.
+    ## Either way, the product graph keeps its blue and red edges apart.
+    if lazy_pg:
+        implicit_product_graph = ImplicitProductGraph(linegraphs, anchor_nodes, limit=limit_pg, molecule=molecule, compact=compact_pg)
+        reachable_nodes = implicit_product_graph.blue_reachable(implicit_product_graph.common_neighbours())
+        mod_product_graph = implicit_product_graph.colored_subgraph(anchor_nodes + reachable_nodes)
+    elif limit_pg:
+        mod_product_graph = pgl(linegraphs, anchor_nodes, molecule=molecule, split=True, compact=compact_pg)
+    elif vectorized_pg:
+        mod_product_graph = pgnlv(linegraphs, split=True, compact=compact_pg)
+    else:
+        mod_product_graph = pgnl(linegraphs, split=True, compact=compact_pg)
 
-    ## Mapping edges in the product graph to their color
-    color_dictionary = nx.get_edge_attributes(mod_product_graph, "color")
+    ## If an anchor node is not in the product graph, it has no neighbours and N = Ø.
+    anchor_indices = [mod_product_graph.index_of(anchor) for anchor in anchor_nodes]
+    if None in anchor_indices:
+        yield edge_anchor
+        return
 
-    ## computing N by intersecting all neighbours among the anchor points
-    common_neighbours_N = list(mod_product_graph.adj[anchor_nodes[0]].keys())
-    for nodes in anchor_nodes:
-        common_neighbours_N = [value for value in common_neighbours_N if value in mod_product_graph.adj[nodes].keys()]
+    ## computing N by intersecting all neighbourhoods of the anchor points
+    common_neighbours_N = mod_product_graph.neighbours(anchor_indices[0])
+    for index in anchor_indices:
+        common_neighbours_N &= mod_product_graph.neighbours(index)
 
-    listN = blue_component_filter(mod_product_graph, common_neighbours_N, anchor_nodes, color_dictionary)
+    listN = blue_component_filter(mod_product_graph, common_neighbours_N, anchor_indices)
 
     ## If no components exist, the anchor is the MCS
     if len(listN) == 0:
-        return [edge_anchor]
+        yield edge_anchor
     else:
-        MCSs = connected_MCS(listN, mod_product_graph, anchor_nodes, color_dictionary)
-
-        all_mappings = []
-        ## list of clique extensions (i.e. list of list of tuples)
-        for mappings in MCSs:
+        ## clique extensions (i.e. lists of product node indices), converted to mappings as they are found
+        for mappings in connected_MCS(listN, mod_product_graph, anchor_indices):
             current_mapping = []
-            for tuples in mappings:
+            for index in mappings:
                 ## (i.e. one tuple of the form (a, b, c, d, ..., z)) up to the number of graphs
                 ## tranformed into their corresponding edge in the graph
-                mapped_edges = [edge_lists[i][tuples[i]] for i in range(n_graphs)]
+                tuples = mod_product_graph.nodes[index]
+                mapped_edges = [edge_indices[i].edge(tuples[i]) for i in range(n_graphs)]
                 current_mapping.append(mapped_edges)
-            all_mappings.append(current_mapping)
-        return all_mappings
+            yield current_mapping
+
+def spill_mappings(mappings, path):
+    """
+        Writes each mapping of the iterable mappings to the JSONL file at path as it passes through, one JSON list of edge lists per line.
+        The file is flushed after every mapping, such that consumers may read it while the mappings are still being computed.
+
+        `Parameters`:
+            mappings (iterable(list(list(edge)))): The mappings to spill
+            path (str): The path of the JSONL file, which is overwritten
+
+        `Returns`:
+            Generator of the mappings, unchanged.
+    """
+    with open(path, "w") as f:
+        for mapping in mappings:
+            f.write(json.dumps(mapping) + "\n")
+            f.flush()
+            yield mapping
+
+def load_spilled_mappings(path):
+    """
+        Reads the mappings written by spill_mappings one line at a time, turning the edges back into tuples.
+
+        `Parameters`:
+            path (str): The path of the JSONL file
 
-def iterative_approach(L, edge_anchor, limit_pg=True, molecule=False):
+        `Returns`:
+            Generator of mappings (list(list(edge))).
+    """
+    with open(path) as f:
+        for line in f:
+            yield [[tuple(edge) for edge in edge_list] for edge_list in json.loads(line)]
+
+def iterative_approach(L, edge_anchor, limit_pg=True, molecule=False, memoize=False, best_only=False, processes=None, order="given"):
     """
         Computes the maximum common subgraph of all graphs in L w.r.t the anchors in edge_anchor.
         
         `Parameters`
-            L (list: Graph): List of NetworkX graphs. Graphs may be decorated with labels.
+            L (list: Graph): List of NetworkX graphs or CSRGraphs. Graphs may be decorated with labels.
 
             edge_anchor (list( list(Edge))): A list of edge anchors. Each edge anchor is a list of edges,
                                             each edge belongs to the graph in the order they are listed.
@@ -233,7 +298,65 @@ def iterative_approach(L, edge_anchor, limit_pg=True, molecule=False):
             molecule: Indicates whether the graphs in L are decorated molecules. If true, it is expected that each graph has
                       attribute "atom_type" on nodes and "bond_type" on edges. This further limits the tuples in the product graph.
                       Default to false.
+
+            memoize: If true, the extensions of a current MCS graph into the next graph are computed once for all branches of the
+                     recursion whose current MCS graphs are isomorphic (respecting labels and which edge is which anchor edge), and
+                     transferred to the others through the isomorphism. The mappings found are the same up to isomorphism, but
+                     representatives and their order may differ. Default to false.
+
+            best_only: If true, only the mappings with the most edges are returned. Extensions only shrink from graph to graph, so a
+                       branch whose current mapping has fewer edges than the best complete mapping found so far is cut, and larger
+                       extensions are explored first to find a large mapping early. Default to false.
+
+            processes (int): If larger than 1, the branches of the recursion are explored by a pool of this many processes, see
+                             parallel_iterative_approach. The mappings are the same and in the same order as with one process.
+                             Cannot be combined with memoize. Default to None.
+
+            order (str): The order the graphs are solved in. "given" solves them in the order of L. "auto" solves them in the order
+                         picked by preprocessing.plan_graph_order, which estimates the product graph sizes, and the mappings still list
+                         the edges in the order of L. The extensions found may differ between orders. Default to "given".
+
+        `Returns`:
+            mapping_list (list( list (list(edge))): The mappings of pairwise non-isomorphic extensions, or [edge_anchor] if the anchor has no extension.
+    """
+    return list(iter_iterative_approach(L, edge_anchor, limit_pg, molecule, memoize=memoize, best_only=best_only, processes=processes, order=order))
+
+def iter_iterative_approach(L, edge_anchor, limit_pg=True, molecule=False, spill=None, memoize=False, best_only=False, processes=None, order="given"):
+    """
+        Generator variant of iterative_approach, yielding the mapping of each leaf of the recursion as soon as it is reached,
+        unless it is isomorphic to a mapping yielded before. See iterative_approach for the parameters.
+
+        `Optional`:
+            spill (str): Path of a JSONL file each yielded mapping is also written to, one mapping per line. Default to None.
+
+        `Returns`:
+            Generator of mappings, in the same order as the list of iterative_approach. With best_only, the mappings are only yielded
+            once the recursion is done, as the best size is not known before.
+    """
+    assert order in ("given", "auto"), f"Unknown graph order {order}"
+    if order == "auto":
+        graph_order = plan_graph_order(L, [[anchors[i] for anchors in edge_anchor] for i in range(len(L))], molecule)
+        L = [L[i] for i in graph_order]
+        edge_anchor = [[anchors[i] for i in graph_order] for anchors in edge_anchor]
+        mappings = _iter_iterative_approach(L, edge_anchor, limit_pg, molecule, memoize, best_only, processes)
+        ## Edge lists are given in the order of the solved graphs, put them back in the order of L
+        position = {i: k for (k, i) in enumerate(graph_order)}
+        mappings = ([[edge_list[position[i]] for i in range(len(L))] for edge_list in mapping] for mapping in mappings)
+    else:
+        mappings = _iter_iterative_approach(L, edge_anchor, limit_pg, molecule, memoize, best_only, processes)
+    if spill is not None:
+        mappings = spill_mappings(mappings, spill)
+    yield from mappings
+
+def _iter_iterative_approach(L, edge_anchor, limit_pg=True, molecule=False, memoize=False, best_only=False, processes=None, branch=None):
+    """
+        Computes the mappings of iter_iterative_approach, without spilling.
+
+        `Optional`:
+            branch (tuple): A node (current_mcs_graph, to_mcs_graph, current_mapping) of the recursion. If given, only the branches of
+                            that node are generated, see parallel_iterative_approach. Default to None.
     """
+    assert not (memoize and processes is not None and processes > 1), "memoize is not supported with processes, the memo is not shared between processes"
 
     def create_induced_graph(mapping, graph_extract_attributes):
         """
@@ -252,14 +375,53 @@ def iterative_approach(L, edge_anchor, limit_pg=True, molecule=False):
         induced_graph.add_nodes_from(nodes_to_add)
         induced_graph.add_edges_from(sorted([edge_list[0] for edge_list in mapping]))
         if molecule:
-            atom_types = nx.get_node_attributes(graph_extract_attributes, "atom_type")
-            bond_types = nx.get_edge_attributes(graph_extract_attributes, "bond_type")
+            atom_types = graph_format.atom_codes(graph_extract_attributes)
+            bond_types = graph_format.bond_codes(graph_extract_attributes)
 
-            nx.set_node_attributes(induced_graph, atom_types, "atom_type")
-            nx.set_edge_attributes(induced_graph, bond_types, "bond_type")
+            nx.set_node_attributes(induced_graph, atom_types, "atom_code")
+            nx.set_edge_attributes(induced_graph, bond_types, "bond_code")
         
         return induced_graph
 
+    def graph_hash(graph):
+        """
+            Weisfeiler-Lehman hash of a graph made by create_induced_graph, respecting labels. Isomorphic graphs have equal
+            hashes, so graphs only need to be checked for isomorphism against graphs with the same hash.
+        """
+        if molecule:
+            return nx.weisfeiler_lehman_graph_hash(graph, edge_attr="bond_code", node_attr="atom_code")
+        ## Hashes are only compared within this process, so the note on hashes of unlabelled graphs changing between
+        ## NetworkX versions does not apply
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            return nx.weisfeiler_lehman_graph_hash(graph)
+
+    def add_if_unique(found_subgraph, unique_buckets):
+        """
+            Adds found_subgraph to unique_buckets, a dictionary from hashes to lists of pairwise non-isomorphic graphs, unless
+            it is isomorphic to a graph in it. Returns whether it was added.
+        """
+        bucket = unique_buckets.setdefault(graph_hash(found_subgraph), [])
+        if isomorphic_to_any(found_subgraph, bucket):
+            return False
+        bucket.append(found_subgraph)
+        return True
+
+    def isomorphic_to_any(found_subgraph, unique_graphs):
+        """
+            Checks whether found_subgraph is isomorphic to any graph in unique_graphs.
+        """
+        for graph in unique_graphs:
+            if molecule:
+                node_match = iso.categorical_node_match("atom_code", None)
+                edge_match = iso.categorical_edge_match("bond_code", None)
+                if nx.is_isomorphic(found_subgraph, graph, node_match, edge_match):
+                    return True
+            else:
+                if nx.is_isomorphic(found_subgraph, graph):
+                    return True
+        return False
+
     def find_unique_graphs(all_mappings, graph_to_induce):
         """
             all_mappings: a list containing the mappings returned from mcs_list_leviBarrowBurstall
@@ -273,8 +435,9 @@ def iterative_approach(L, edge_anchor, limit_pg=True, molecule=False):
                 unique_mappings: a dict ontaining the mappings corresponding to each unique graph in unique_graphs
         """
         index_counter = 0
-        ## Saving graphs that are not isomporphic to already seen graphs
+        ## Saving graphs that are not isomporphic to already seen graphs, and the same graphs bucketed by hash
         unique_graphs = []
+        unique_buckets = {}
         ## mapping each index in unique_mappings to their mapping
         unique_mappings = {}
         for mappings in all_mappings:
@@ -282,61 +445,99 @@ def iterative_approach(L, edge_anchor, limit_pg=True, molecule=False):
             ## Creates the induced graph from the current mapping
             found_subgraph = create_induced_graph(mappings, graph_to_induce)
 
-            found_isomorph = False
-            ## The found_subgraph needs to be checked against each graph already added as a unique graph
-            for graph in unique_graphs:
-                if molecule:
-                    node_match = iso.categorical_node_match("atom_type", "")
-                    edge_match = iso.categorical_edge_match("bond_type", "")
-                    if nx.is_isomorphic(found_subgraph, graph, node_match, edge_match):
-                        found_isomorph = True
-                        break
-                else:
-                    if nx.is_isomorphic(found_subgraph, graph):
-                        found_isomorph = True
-                        break
-                
             ## Only add graphs to the list if it is not isomorphic to any existing graphs
-            if not found_isomorph:
+            if add_if_unique(found_subgraph, unique_buckets):
                 unique_graphs.append(found_subgraph)
                 unique_mappings[index_counter] = mappings
                 index_counter += 1
         
         return unique_graphs, unique_mappings
 
-    def _iterative_approach_rec(L, current_mcs_graph, to_mcs_graph, all_mappings, current_mapping, anchor_bound, anchor, graph_amt, limit_pg=True, molecule=False):
+    ## memo[(to_mcs_graph, hash)] is a list of (labelled_graph, mcs) for the solved extensions of current MCS graphs with
+    ## that Weisfeiler-Lehman hash into L[to_mcs_graph], see extensions
+    memo = {}
+
+    def anchor_labelled_graph(graph, anchor):
         """
-            Computes the maximal anchor extentions between current_mcs_graph and L[to_mcs_graph] and
-            recursively branches out on each maximal extension who actually includes edges outside the anchor. 
-            In case a leaf is reached, the algorithm terminates and inserts the currently built mapping into the list of all mappings.
+            Copy of graph with a "label" on every node (its atom code) and edge (its bond code and index in anchor, or -1),
+            such that isomorphisms respecting the labels map each anchor edge to the anchor edge with the same index.
+        """
+        anchor_index = EdgeIndex(graph)
+        anchor_of = {anchor_index.index(anchors[0]): i for (i, anchors) in enumerate(anchor)}
+        atom_types = graph_format.atom_codes(graph) if molecule else {}
+        bond_types = graph_format.bond_codes(graph) if molecule else {}
+
+        labelled_graph = nx.Graph()
+        labelled_graph.add_nodes_from((node, {"label": str(atom_types.get(node, 0))}) for node in graph.nodes)
+        for (i, (u, v)) in enumerate(anchor_index.edges):
+            labelled_graph.add_edge(u, v, label=f"{bond_types.get((u, v), 0)},{anchor_of.get(i, -1)}")
+        return labelled_graph
+
+    def extensions(graph_one, to_mcs_graph, new_anchor, anchor):
+        """
+            Computes mcs_list_leviBarrowBurstall([graph_one, L[to_mcs_graph]], new_anchor), or with memoize, transfers the
+            result of an isomorphic graph solved before to graph_one.
+        """
+        if not memoize:
+            return mcs_list_leviBarrowBurstall([graph_one, L[to_mcs_graph]], new_anchor, limit_pg, molecule)
+
+        labelled_graph = anchor_labelled_graph(graph_one, anchor)
+        key = (to_mcs_graph, nx.weisfeiler_lehman_graph_hash(labelled_graph, edge_attr="label", node_attr="label"))
+        label_match = iso.categorical_node_match("label", None)
+        for (solved_graph, mcs) in memo.get(key, []):
+            matcher = iso.GraphMatcher(solved_graph, labelled_graph, label_match, iso.categorical_edge_match("label", None))
+            if matcher.is_isomorphic():
+                ## Edges of graph_one are given in the orientation of graph_one.edges, as in a result computed for graph_one
+                graph_one_index = EdgeIndex(graph_one)
+                phi = matcher.mapping
+                transferred_mcs = []
+                for mapping in mcs:
+                    transferred_mapping = []
+                    for [(u, v), edge] in mapping:
+                        transferred_mapping.append([graph_one_index.edge(graph_one_index.index((phi[u], phi[v]))), edge])
+                    transferred_mcs.append(transferred_mapping)
+                return transferred_mcs
+
+        mcs = mcs_list_leviBarrowBurstall([graph_one, L[to_mcs_graph]], new_anchor, limit_pg, molecule)
+        memo.setdefault(key, []).append((labelled_graph, mcs))
+        return mcs
+
+    def branches(current_mcs_graph, to_mcs_graph, current_mapping):
+        """
+            Computes the maximal anchor extensions between current_mcs_graph and L[to_mcs_graph], and returns the branches of the
+            recursion on each extension that actually includes edges outside the anchor, as a list of
+            (graph_to_recurse, to_mcs_graph + 1, continue_mapping) in the order they are explored.
         """
-        
-        ## If end of L is reached, add the current mapping to the global list of mappings
-        if to_mcs_graph == graph_amt:
-            all_mappings.append(current_mapping)
-            return
-
         graph_one = current_mcs_graph
-        graph_two = L[to_mcs_graph]
 
         ## Map edges from current best graph to the upcoming "to_mcs_graph"
-        new_anchor = [ [lists[0], lists[to_mcs_graph] ] for lists in anchor ]
+        new_anchor = [ [lists[0], lists[to_mcs_graph] ] for lists in edge_anchor ]
 
-        mcs = mcs_list_leviBarrowBurstall([graph_one, graph_two], new_anchor, limit_pg, molecule)
+        mcs = extensions(graph_one, to_mcs_graph, new_anchor, edge_anchor)
         
         ## Filter duplicates, no need to branch multiple times for identical mappings
         filtered_mcs = []
+        seen_mappings = set()
         for l in mcs:
-            if sorted(l) not in filtered_mcs:
-                filtered_mcs.append(sorted(l))
+            sorted_mapping = sorted(l)
+            mapping_key = tuple(tuple(edge_list) for edge_list in sorted_mapping)
+            if mapping_key not in seen_mappings:
+                seen_mappings.add(mapping_key)
+                filtered_mcs.append(sorted_mapping)
         
         unique_graphs, unique_mappings = find_unique_graphs(filtered_mcs, graph_one)  
+
+        ## Largest extensions first, such that the incumbent grows early (sorting is stable)
+        branch_order = range(len(unique_graphs))
+        if best_only:
+            branch_order = sorted(branch_order, key=lambda i: -len(unique_mappings[i]))
         
-        for i in range(len(unique_graphs)):
+        children = []
+        for i in branch_order:
             graph_to_recurse = unique_graphs[i]
             mapping_to_recurse = unique_mappings[i]
             ## Only add extensions of the anchor
-            if len(mapping_to_recurse) > anchor_bound:  
+            if len(mapping_to_recurse) > anchor_size:  
                 
                 ## If no mapping has been created yet, this is the first mapping
                 if not current_mapping:
@@ -357,31 +558,125 @@ def iterative_approach(L, edge_anchor, limit_pg=True, molecule=False):
                                 new_current_mapping[j].append(edge_list[1])
                                 ## only move those mapped edges forward with newly mapped edges
                                 continue_mapping.append(new_current_mapping[j])
-                ## Continue recursively
-                _iterative_approach_rec(L, graph_to_recurse, to_mcs_graph + 1, all_mappings, continue_mapping, anchor_bound, anchor, graph_amt, limit_pg, molecule)
+                children.append((graph_to_recurse, to_mcs_graph + 1, continue_mapping))
+        return children
+
+    def _iterative_approach_rec(current_mcs_graph, to_mcs_graph, current_mapping):
+        """
+            Recursively branches out on each branch of current_mcs_graph, see branches.
+            In case a leaf is reached, the algorithm terminates and yields the currently built mapping.
+        """
+        
+        nonlocal best_size
+
+        ## If end of L is reached, yield the current mapping
+        if to_mcs_graph == len(L):
+            best_size = max(best_size, len(current_mapping))
+            yield current_mapping
+            return
+
+        for (graph_to_recurse, next_graph, continue_mapping) in branches(current_mcs_graph, to_mcs_graph, current_mapping):
+            ## The mappings of the leaves below have at most as many edges as continue_mapping
+            if best_only and len(continue_mapping) < best_size:
+                continue
+            ## Continue recursively
+            yield from _iterative_approach_rec(graph_to_recurse, next_graph, continue_mapping)
 
     ## Use anchor_size as guard in the recursive step, terminating branches that reach this length
     anchor_size = len(edge_anchor)
-    mapping_list = []
 
-    ## first recursive step is between graph 0 and graph 1. 
-    ## the mapping list is updated for each recursive call that ends up with 
-    ## an actual extension of the anchor.
-    _iterative_approach_rec(L, L[0], 1, mapping_list, [], anchor_size, edge_anchor, len(L), limit_pg, molecule)
+    ## A worker process of parallel_iterative_approach only computes the branches of one node of the recursion
+    if branch is not None:
+        yield from branches(*branch)
+        return
 
-    ## No extensions found, the mapping is the anchor
-    if not mapping_list:
-        mapping_list = [edge_anchor]
+    unique_buckets = {}
+    ## The number of edges of the largest mapping found at a leaf, the incumbent of best_only
+    best_size = 0
 
-    ## Some extensions found, possibly some duplicates.
+    ## first recursive step is between graph 0 and graph 1. 
+    ## each recursive call that ends up with an actual extension of the anchor yields its mapping.
+    if processes is not None and processes > 1:
+        leaves = parallel_iterative_approach((L, edge_anchor, limit_pg, molecule, memoize, best_only), (L[0], 1, []), processes)
     else:
+        leaves = _iterative_approach_rec(L[0], 1, [])
+    if best_only:
+        leaves = list(leaves)
+        best_size = max((len(mapping) for mapping in leaves), default=0)
+        leaves = [mapping for mapping in leaves if len(mapping) == best_size]
+    for mapping in leaves:
         ## filter based on isomorphism - some branches might reduce to the same mapping in the end.
-        unique_graphs, unique_mappings = find_unique_graphs(mapping_list, L[0])
-        
-        ## unique_mappings is a dict of mappings for each unique graph found. Extract such mappings.
-        mapping_list = [unique_mappings[i] for i in unique_mappings]
+        found_subgraph = create_induced_graph(mapping, L[0])
+        if add_if_unique(found_subgraph, unique_buckets):
+            yield mapping
+
+    ## No extensions found, the mapping is the anchor
+    if not unique_buckets:
+        yield edge_anchor
+
+## Arguments of _iter_iterative_approach in a worker process, set once per process by _init_worker
+_worker_args = None
+
+def _init_worker(args):
+    global _worker_args
+    _worker_args = args
 
-        return mapping_list
+def _expand_branch(branch):
+    return list(_iter_iterative_approach(*_worker_args, branch=branch))
+
+def parallel_iterative_approach(args, root, processes):
+    """
+        Runs the recursion of _iter_iterative_approach over a pool of processes. Every node of the recursion tree is a task computing
+        the branches of that node, and the branches are submitted as soon as they are known. The pool shares one queue of pending
+        nodes from all subtrees, so a process finishing a task takes the next pending node of any subtree, and one large subtree is
+        spread over all processes.
+
+        The leaves are yielded as they become final, in the order of a sequential run: a leaf is held back until every node before
+        it in depth-first order is done.
+
+        `Parameters`:
+            args (tuple): The positional arguments of _iter_iterative_approach, sent to each process once
+            root (tuple): The root node of the recursion, (current_mcs_graph, to_mcs_graph, current_mapping)
+            processes (int): The number of worker processes
+
+        `Returns`:
+            Generator of the mappings of the leaves, in the order of a sequential run.
+    """
+    (L, best_only) = (args[0], args[5])
+    ## The path of a node is the tuple of branch indices leading to it, and depth-first order is the order of paths
+    pending = {}
+    leaves = []
+    best_size = 0
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(args,)) as executor:
+
+        def submit(path, node):
+            nonlocal best_size
+            (current_mcs_graph, to_mcs_graph, current_mapping) = node
+            if to_mcs_graph == len(L):
+                best_size = max(best_size, len(current_mapping))
+                heapq.heappush(leaves, (path, current_mapping))
+            else:
+                pending[executor.submit(_expand_branch, node)] = path
+
+        submit((), root)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                for (i, child) in enumerate(future.result()):
+                    ## The mappings of the leaves below have at most as many edges as the mapping of child
+                    if best_only and len(child[2]) < best_size:
+                        continue
+                    submit(path + (i,), child)
+
+            ## The nodes below a pending node come after every path smaller than it
+            first_pending = min(pending.values(), default=None)
+            while leaves and (first_pending is None or leaves[0][0] < first_pending):
+                yield heapq.heappop(leaves)[1]
+
+        while leaves:
+            yield heapq.heappop(leaves)[1]
 
 def all_products(L, edge_anchor, limit_pg=True, molecule=False):
     """
@@ -528,11 +823,11 @@ def gradual_iterative(L, edge_anchor, limit_pg=True, molecule=False):
         induced_graph.add_nodes_from(nodes_to_add)
         induced_graph.add_edges_from(sorted([edge_list[0] for edge_list in mapping]))
         if molecule:
-            atom_types = nx.get_node_attributes(graph_extract_attributes, "atom_type")
-            bond_types = nx.get_edge_attributes(graph_extract_attributes, "bond_type")
+            atom_types = graph_format.atom_codes(graph_extract_attributes)
+            bond_types = graph_format.bond_codes(graph_extract_attributes)
 
-            nx.set_node_attributes(induced_graph, atom_types, "atom_type")
-            nx.set_edge_attributes(induced_graph, bond_types, "bond_type")
+            nx.set_node_attributes(induced_graph, atom_types, "atom_code")
+            nx.set_edge_attributes(induced_graph, bond_types, "bond_code")
         
         return induced_graph
 
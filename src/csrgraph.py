@@ -0,0 +1,296 @@
+import networkx as nx
+import numpy as np
+from array import array
+from graph_format import atom_codes, bond_codes, atom_type_of, bond_type_of
+
+
+def _int_array(values):
+    """
+        Stores integers in a compact array('q'). Slices of it are cheap to take and yield Python ints, unlike NumPy slices.
+    """
+    return array("q", np.asarray(values, dtype=np.int64).tobytes())
+
+def _as_numpy(values):
+    """
+        Zero-copy NumPy view of an array('q'), for vectorized operations.
+    """
+    return np.frombuffer(values, dtype=np.int64) if len(values) else np.zeros(0, dtype=np.int64)
+
+
+class CSRGraph:
+    """
+    Immutable undirected graph stored in compressed sparse row (CSR) form, for the solver hot paths. It implements the
+    part of the NetworkX Graph interface used by the line graph, product graph, preprocessing and McGregor code
+    (nodes, edges, adj, edges(u), ...), such that it can be passed wherever those expect a NetworkX graph. In particular, the
+    graphs given to mcs_list_leviBarrowBurstall, iterative_approach, mcs_mcgregor, anchor_reach and shrink_graphs may be
+    CSRGraphs. The graphs built along the way for isomorphism checks are still NetworkX graphs.
+
+    Node `i` (the i'th node of `nodes`) has the neighbours neighbour_ids[offsets[i]:offsets[i + 1]], and
+    incident_edges[offsets[i]:offsets[i + 1]] holds the ids of the corresponding edges. Edge `k` is
+    (edge_u[k], edge_v[k]) and is the k'th edge of `edges`, as in list(G.edges) of the NetworkX graph it was built from.
+
+    All arrays are array('q') of integers, which take 8 bytes per entry.
+
+    `node_ids`: The node ids, in the order of G.nodes
+
+    `offsets`, `neighbour_ids`, `incident_edges`: The CSR arrays
+
+    `edge_u`, `edge_v`: The end nodes of each edge
+
+    `node_labels`: A dictionary from attribute names to integer arrays with the attribute of each node, e.g. "atom_code"
+
+    `edge_labels`: A dictionary from attribute names to integer arrays with the attribute of each edge, e.g. "bond_code"
+    """
+
+    def __init__(self, nodes, edges, node_labels=None, edge_labels=None, adjacency=None):
+        """
+            `Parameters`:
+                nodes (iterable(int)): The node ids
+                edges (iterable(edge)): The edges, edge `k` gets id `k`
+
+            `Optional`:
+                node_labels (dict: str -> list(int)): Label arrays of the nodes, aligned with nodes
+                edge_labels (dict: str -> list(int)): Label arrays of the edges, aligned with edges
+                adjacency (iterable(list(int))): The neighbours of each node in the order they should be listed, aligned with nodes.
+                                                 Default to the order of edge ids.
+        """
+        node_ids = np.asarray(list(nodes), dtype=np.int64)
+        n_nodes = len(node_ids)
+        self.node_ids = _int_array(node_ids)
+        ## Node ids are used as positions when they are 0, 1, ..., n - 1, as in line graphs
+        if np.array_equal(node_ids, np.arange(n_nodes)):
+            self._position = None
+        else:
+            self._position = {node: i for i, node in enumerate(self.node_ids)}
+
+        edges = np.asarray(list(edges), dtype=np.int64).reshape(-1, 2)
+        edge_u, edge_v = edges[:, 0], edges[:, 1]
+        self.edge_u, self.edge_v = _int_array(edge_u), _int_array(edge_v)
+        n_edges = len(edge_u)
+
+        if adjacency is None:
+            ## Each edge is listed at both end nodes (once for self-loops), in order of edge id
+            u_positions = self._positions(edge_u)
+            v_positions = self._positions(edge_v)
+            edge_ids = np.arange(n_edges)
+            not_loop = u_positions != v_positions
+            sources = np.concatenate([u_positions, v_positions[not_loop]])
+            targets = np.concatenate([edge_v, edge_u[not_loop]])
+            incident = np.concatenate([edge_ids, edge_ids[not_loop]])
+            order = np.lexsort((incident, sources))
+            neighbour_ids, incident = targets[order], incident[order]
+            degrees = np.bincount(sources, minlength=n_nodes)
+        else:
+            edge_id = {}
+            for k, (u, v) in enumerate(zip(self.edge_u, self.edge_v)):
+                edge_id[(u, v)] = edge_id[(v, u)] = k
+            neighbour_ids, incident, degrees = [], [], []
+            for node, neighbours in zip(self.node_ids, adjacency):
+                neighbours = list(neighbours)
+                neighbour_ids.extend(neighbours)
+                incident.extend(edge_id[(node, neighbour)] for neighbour in neighbours)
+                degrees.append(len(neighbours))
+        self.neighbour_ids = _int_array(neighbour_ids)
+        self.incident_edges = _int_array(incident)
+        self.offsets = _int_array(np.concatenate([[0], np.cumsum(degrees, dtype=np.int64)]))
+
+        self.node_labels = {name: _int_array(values) for name, values in (node_labels or {}).items()}
+        self.edge_labels = {name: _int_array(values) for name, values in (edge_labels or {}).items()}
+
+        self.nodes = _CSRNodeView(self)
+        self.edges = _CSREdgeView(self)
+        self.adj = _CSRAdjacency(self)
+
+    def _positions(self, node_ids):
+        if self._position is None:
+            return np.asarray(node_ids, dtype=np.int64)
+        return np.asarray([self._position[node] for node in node_ids], dtype=np.int64)
+
+    def position(self, node):
+        """
+            Returns the position of node in node_ids.
+        """
+        return node if self._position is None else self._position[node]
+
+    @classmethod
+    def from_networkx(cls, G, node_attributes=(), edge_attributes=(), molecule=False):
+        """
+            Converts a NetworkX graph, keeping the order of G.nodes, G.edges and G.adj.
+
+            `Parameters`:
+                G (Graph): A NetworkX graph with integer nodes
+
+            `Optional`:
+                node_attributes (iterable(str)): Names of integer node attributes to store as label arrays
+                edge_attributes (iterable(str)): Names of integer edge attributes to store as label arrays
+                molecule (boolean): If true, the interned "atom_code" and "bond_code" labels are stored as well. Default to false.
+
+            `Returns`:
+                CSR (CSRGraph): The frozen graph
+        """
+        nodes = list(G.nodes)
+        edges = list(G.edges)
+        node_labels = {name: [G.nodes[node][name] for node in nodes] for name in node_attributes}
+        edge_labels = {name: [G.edges[edge][name] for edge in edges] for name in edge_attributes}
+        if molecule:
+            node_atom_codes, edge_bond_codes = atom_codes(G), bond_codes(G)
+            node_labels["atom_code"] = [node_atom_codes[node] for node in nodes]
+            edge_labels["bond_code"] = [edge_bond_codes[edge] for edge in edges]
+        return cls(nodes, edges, node_labels, edge_labels, adjacency=(G.adj[node] for node in nodes))
+
+    def to_networkx(self):
+        """
+            Converts the graph back to a NetworkX graph with the same node and edge order. Label arrays become attributes,
+            and interned atom and bond codes are also decoded into "atom_type" and "bond_type".
+        """
+        G = nx.Graph()
+        for i, node in enumerate(self.node_ids):
+            attributes = {name: values[i] for name, values in self.node_labels.items()}
+            if "atom_code" in attributes:
+                attributes["atom_type"] = atom_type_of(attributes["atom_code"])
+            G.add_node(node, **attributes)
+        for k, (u, v) in enumerate(self.edges):
+            attributes = {name: values[k] for name, values in self.edge_labels.items()}
+            if "bond_code" in attributes:
+                attributes["bond_type"] = bond_type_of(attributes["bond_code"])
+            G.add_edge(u, v, **attributes)
+        return G
+
+    def subgraph(self, nodes):
+        """
+            Returns the subgraph induced by nodes as a new CSRGraph. Nodes, edges and neighbours keep their relative order,
+            as when removing all other nodes from a NetworkX graph.
+        """
+        keep = np.zeros(len(self.node_ids), dtype=bool)
+        keep[self._positions(list(nodes))] = True
+        edge_u, edge_v = _as_numpy(self.edge_u), _as_numpy(self.edge_v)
+        keep_edges = keep[self._positions(edge_u)] & keep[self._positions(edge_v)]
+        neighbour_ids, incident_edges = _as_numpy(self.neighbour_ids), _as_numpy(self.incident_edges)
+        adjacency = []
+        for i in np.flatnonzero(keep).tolist():
+            start, end = self.offsets[i], self.offsets[i + 1]
+            adjacency.append(neighbour_ids[start:end][keep_edges[incident_edges[start:end]]].tolist())
+        return CSRGraph(
+            _as_numpy(self.node_ids)[keep],
+            np.stack([edge_u[keep_edges], edge_v[keep_edges]], axis=1),
+            {name: _as_numpy(values)[keep] for name, values in self.node_labels.items()},
+            {name: _as_numpy(values)[keep_edges] for name, values in self.edge_labels.items()},
+            adjacency,
+        )
+
+    def neighbors(self, node):
+        return iter(self.adj[node])
+
+    def number_of_nodes(self):
+        return len(self.node_ids)
+
+    def number_of_edges(self):
+        return len(self.edge_u)
+
+    def is_directed(self):
+        return False
+
+    def is_multigraph(self):
+        return False
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __iter__(self):
+        return iter(self.node_ids)
+
+    def __contains__(self, node):
+        return node in self.nodes
+
+    def __getitem__(self, node):
+        return self.adj[node]
+
+
+class _CSRNodeView:
+    """
+    The nodes of a CSRGraph, supporting iteration, len, membership and G.nodes(data=name).
+    """
+
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __iter__(self):
+        return iter(self._graph.node_ids)
+
+    def __len__(self):
+        return len(self._graph.node_ids)
+
+    def __contains__(self, node):
+        if self._graph._position is None:
+            return isinstance(node, (int, np.integer)) and 0 <= node < len(self._graph.node_ids)
+        return node in self._graph._position
+
+    def __call__(self, data=False):
+        node_ids = self._graph.node_ids
+        if not data:
+            return iter(node_ids)
+        values = self._graph.node_labels.get(data)
+        if values is None:
+            return ((node, None) for node in node_ids)
+        return zip(node_ids, values)
+
+
+class _CSREdgeView:
+    """
+    The edges of a CSRGraph in order of edge id, supporting iteration, len, membership, G.edges(node) and G.edges(data=name).
+    """
+
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __iter__(self):
+        return zip(self._graph.edge_u, self._graph.edge_v)
+
+    def __len__(self):
+        return len(self._graph.edge_u)
+
+    def __contains__(self, edge):
+        (u, v) = edge
+        return u in self._graph.nodes and v in self._graph.adj[u]
+
+    def __call__(self, nbunch=None, data=False):
+        graph = self._graph
+        if nbunch is None:
+            edges = iter(self)
+            edge_ids = range(len(self))
+        else:
+            ## Edges incident to the given node(s), oriented away from them
+            nodes = [nbunch] if isinstance(nbunch, (int, np.integer)) else list(nbunch)
+            edges, edge_ids = [], []
+            for node in nodes:
+                i = graph.position(node)
+                start, end = graph.offsets[i], graph.offsets[i + 1]
+                edges.extend((node, neighbour) for neighbour in graph.neighbour_ids[start:end])
+                edge_ids.extend(graph.incident_edges[start:end])
+        if not data:
+            return list(edges)
+        values = graph.edge_labels.get(data)
+        return [(u, v, None if values is None else values[k]) for (u, v), k in zip(edges, edge_ids)]
+
+
+class _CSRAdjacency:
+    """
+    G.adj of a CSRGraph: adj[node] is the array of neighbours of node, in neighbour order.
+    """
+
+    def __init__(self, graph):
+        self._neighbour_ids = graph.neighbour_ids
+        self._offsets = graph.offsets
+        self._position = graph._position
+        self._graph = graph
+
+    def __getitem__(self, node):
+        i = node if self._position is None else self._position[node]
+        return self._neighbour_ids[self._offsets[i]:self._offsets[i + 1]]
+
+    def __iter__(self):
+        return iter(self._graph.node_ids)
+
+    def __len__(self):
+        return len(self._graph.node_ids)
+
@@ -262,11 +262,14 @@ def draw_mcgregor_mcs_graphs(G, H, mapping, marcs, anchor={}):
             G (Graph): A NetworkX graph, nodes are integers but may be decorated with items
             H (Graph): A NetworkX graph, nodes are integers but may be decorated with items
             mapping (dict: int -> int): The node correspondence for the MCS
-            marcs (np.array): The MARCS array for the MCS
+            marcs (np.array or BlockMARCS): The MARCS array for the MCS
 
         `Optional`:
             anchor (dict: int -> int): The initial anchor point. Can be declared with dict([(a, b), (b, c), ...])
     """
+    ## mcs_mcgregor returns MARCS as a BlockMARCS unless asked for a dense array
+    if not isinstance(marcs, np.ndarray):
+        marcs = marcs.to_dense()
     
     
     ## String used for nodes mapped to each other
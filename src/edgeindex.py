@@ -0,0 +1,51 @@
+class EdgeIndex:
+    """
+    Canonical numbering of the edges of a graph. Edge `i` is the i'th edge of list(G.edges), which is also node `i`
+    in the line graph of G and row/column `i` in MARCS. Both orientations of an edge map to the same id, such that
+    looking up an edge is O(1) instead of list(G.edges).index(edge).
+
+    `edges`: The list of edges, edges[i] is the edge with id `i` in the orientation of G.edges
+
+    `ids`: A dictionary from both orientations (u, v) and (v, u) of each edge to its id
+
+    `incident`: A dictionary from each node to the list of ids of its incident edges, in increasing order
+    """
+
+    def __init__(self, G):
+        self.edges = list(G.edges)
+        self.ids = {}
+        self.incident = {node: [] for node in G.nodes}
+        for i in range(len(self.edges)):
+            (u, v) = self.edges[i]
+            self.ids[(u, v)] = i
+            self.ids[(v, u)] = i
+            self.incident[u].append(i)
+            if v != u:
+                self.incident[v].append(i)
+
+    def __len__(self):
+        return len(self.edges)
+
+    def __contains__(self, edge):
+        return tuple(edge) in self.ids
+
+    def index(self, edge):
+        """
+            Returns the id of edge, given in either orientation. Raises a KeyError if edge is not in the graph.
+        """
+        return self.ids[tuple(edge)]
+
+    def edge(self, i):
+        """
+            Returns the edge with id `i`, in the orientation of G.edges.
+        """
+        return self.edges[i]
+
+    def incident_to(self, *nodes):
+        """
+            Returns the set of ids of the edges incident to any of the given nodes.
+        """
+        incident_ids = set()
+        for node in nodes:
+            incident_ids.update(self.incident[node])
+        return incident_ids
@@ -35,11 +35,82 @@ def switch_bond_type(input):
     else:
         return "q"
 
+## Label interning: each distinct atom type, bond type and atom pair is given a small integer code, shared by all graphs
+## of this process, such that labels are compared as integers (and may be put in NumPy arrays) instead of strings or sets.
+_atom_type_codes = {}
+_bond_type_codes = {}
+_atom_pair_codes = {}
+
+## The labels in order of their codes, for decoding
+_atom_type_list = []
+_bond_type_list = []
+
+def _intern(table, label, labels=None):
+    code = table.get(label)
+    if code is None:
+        code = len(table)
+        table[label] = code
+        if labels is not None:
+            labels.append(label)
+    return code
+
+def atom_code(atom_type):
+    """
+        Returns the integer code of atom_type, e.g. "C".
+    """
+    return _intern(_atom_type_codes, atom_type, _atom_type_list)
+
+def bond_code(bond_type):
+    """
+        Returns the integer code of bond_type, e.g. "s".
+    """
+    return _intern(_bond_type_codes, bond_type, _bond_type_list)
+
+def atom_type_of(code):
+    """
+        Returns the atom type with the given code.
+    """
+    return _atom_type_list[code]
+
+def bond_type_of(code):
+    """
+        Returns the bond type with the given code.
+    """
+    return _bond_type_list[code]
+
+def atom_pair_code(atom_code_1, atom_code_2):
+    """
+        Returns the integer code of the unordered pair of atoms with codes atom_code_1 and atom_code_2.
+    """
+    return _intern(_atom_pair_codes, (min(atom_code_1, atom_code_2), max(atom_code_1, atom_code_2)))
+
+def atom_codes(G):
+    """
+        Returns a dictionary from the nodes of G to their atom codes. Uses the "atom_code" attribute set by convert_graph_file,
+        and interns the "atom_type" attribute for graphs without it.
+    """
+    codes = dict(G.nodes(data="atom_code"))
+    if None in codes.values():
+        codes = {node: atom_code(atom_type) for (node, atom_type) in G.nodes(data="atom_type")}
+    return codes
+
+def bond_codes(G):
+    """
+        Returns a dictionary from the edges of G (in the orientation of G.edges) to their bond codes. Uses the "bond_code" attribute
+        set by convert_graph_file, and interns the "bond_type" attribute for graphs without it.
+    """
+    codes = {(u, v): code for (u, v, code) in G.edges(data="bond_code")}
+    if None in codes.values():
+        codes = {(u, v): bond_code(bond_type) for (u, v, bond_type) in G.edges(data="bond_type")}
+    return codes
+
 def convert_graph_file(path):
     """
         Given a path to a file containing anchored molecule graphs, computes a list
         of these graphs in NetworkX' Graph representation. Additionally, a list
         of anchored edges L is returned s.t. L[i] contains all anchored edges in G[i].
+
+        Nodes have the attributes "atom_type" and its interned "atom_code", edges have "bond_type" and "bond_code".
     """
 
     ## The file containing our data is currently hardcodedd, could potentially be changed
@@ -86,7 +157,8 @@ def convert_graph_file(path):
                     string_split = string.split(" ")
                     node = int(string_split[0])
                     G.add_node(node)
-                    node_attribute_dict[node] = {"atom_type": string_split[1].strip()}
+                    atom_type = string_split[1].strip()
+                    node_attribute_dict[node] = {"atom_type": atom_type, "atom_code": atom_code(atom_type)}
                 ## Adding edges
                 else:
                     string_split = string.split(" ")
@@ -108,7 +180,7 @@ def convert_graph_file(path):
                         bond = string_split[2].strip()
                     ## Using switch function to convert to our format of bond type
                     correct_bond = switch_bond_type(bond)
-                    edge_attribute_dict[edge] = {"bond_type": correct_bond}
+                    edge_attribute_dict[edge] = {"bond_type": correct_bond, "bond_code": bond_code(correct_bond)}
 
 
     #Saving the last graph
@@ -143,12 +215,12 @@ def compute_anchor(Gs, AEs, molecule=False):
             anchors = AEs[i]
             ## Mapping edge types to list of edges
             g_edge_type_map = {}
-            g_atom_type = nx.get_node_attributes(g, "atom_type")
-            g_bond_type = nx.get_edge_attributes(g, "bond_type") 
+            g_atom_type = atom_codes(g)
+            g_bond_type = bond_codes(g)
             for j in range(n_anchored_edges):
                 ## An anchor edge_j in G_i
                 (u, v) = anchors[j]
-                atom_pair = tuple(sorted((g_atom_type[u], g_atom_type[v])))
+                atom_pair = atom_pair_code(g_atom_type[u], g_atom_type[v])
                 ## Ignore networkX edge ordering problems
                 try:
                     bond_type = g_bond_type[(u, v)]
@@ -170,7 +242,7 @@ def compute_anchor(Gs, AEs, molecule=False):
         ## Save the first dictionary for graph 0 to retrieve attributes
         init_edge_type_dict = g_edge_types[0]
 
-        ## List of all possible edge types e.g. (('O', 'P'), 's'), (('H', 'O), 'd')
+        ## List of all possible edge types, (atom pair code, bond code) e.g. for (('O', 'P'), 's'), (('H', 'O), 'd')
         possible_edge_types = [key for key in init_edge_type_dict]
         ## Number of edges of the different types
         n_edge_type_edges = {key: len(init_edge_type_dict[key]) for key in init_edge_type_dict}
@@ -1,4 +1,8 @@
 import networkx as nx
+import weakref
+from edgeindex import EdgeIndex
+from graph_format import atom_codes, bond_codes, atom_pair_code
+from csrgraph import CSRGraph
 
 ### Authors: Tobias Klink Lehn (toleh20@student.sdu.dk) and Kasper Halkjær Beider (kbeid20@student.sdu.dk)
 def line_graph(G, molecule=False):
@@ -8,61 +12,102 @@ def line_graph(G, molecule=False):
     for every two edges in G that have a vertex in common, make an edge between their corresponding vertices in L(G).
 
         `Parameters`:
-            G (Graph): A NetworkX graph.
+            G (Graph): A NetworkX graph or CSRGraph.
         
         `Optional`:
             molecule (Boolean): A boolean optional to specify whether the nodes are decorated with attributes
-                atom_pair: A set of atoms that a node connects e.g. {C, O}
-                bond_type: The type of bond of an edge in ['s', 'd', 't', 'q']
+                atom_pair: The interned code of the unordered pair of atoms that a node connects e.g. {C, O}
+                bond_type: The interned code of the type of bond of an edge in ['s', 'd', 't', 'q']
         
         `Returns`:
-            LG (Graph): A NetworkX graph in which node 'i' in LG corresponds to edge 'i' in G. 
+            LG (Graph): A NetworkX graph in which node 'i' in LG corresponds to edge 'i' in G. If G is a CSRGraph, so is LG,
+                        with the molecule attributes as label arrays.
     """
 
-    def has_node_in_common(e1, e2):
-        """
-            Precondition: e1 and e2 are not identical
-        """
-        (x1, y1) = e1
-        (x2, y2) = e2
-
-        return x1 == x2 or x1 == y1 or y1 == x2 or y1 == y2
+    edge_index = EdgeIndex(G)
+    G_edges = edge_index.edges
+    
+    node_attributes = {}
+    if molecule:
+        atom_types = atom_codes(G)
+        bond_types = bond_codes(G)
+        ## Adding molecule-related labels for the nodes in the linegraph
+        node_attributes["atom_pair"] = [atom_pair_code(atom_types[u], atom_types[v]) for (u, v) in G_edges]
+        node_attributes["bond_type"] = [bond_types[(u, v)] for (u, v) in G_edges]
+
+    ## O(sum of deg(w)^2): two edges have a node in common iff they are both incident to some node w.
+    ## Edges sharing both end nodes (multigraphs) are found twice, hence the set.
+    LG_edges = set()
+    for edges_at_w in edge_index.incident.values():
+        for a in range(len(edges_at_w)):
+            for b in range(a + 1, len(edges_at_w)):
+                LG_edges.add((edges_at_w[a], edges_at_w[b]))
+    ## Same edge order as comparing all pairs of edges
+    LG_edges = sorted(LG_edges)
+
+    if isinstance(G, CSRGraph):
+        return CSRGraph(range(len(G_edges)), LG_edges, node_labels=node_attributes)
 
     LG = nx.Graph()
+    for i in range(len(G_edges)):
+        LG.add_node(i, **{name: values[i] for name, values in node_attributes.items()})
+    LG.add_edges_from(LG_edges)
 
-    G_edges = list(G.edges)
-    
+    return LG
+
+## Line graphs computed by cached_line_graph, per input graph and molecule flag
+_line_graph_cache = weakref.WeakKeyDictionary()
+
+def graph_fingerprint(G, molecule=False):
+    """
+        Computes a fingerprint of the content of G line_graph depends on: the edges in order and, if molecule is true,
+        the atom codes of their end nodes and their bond codes.
+    """
     if molecule:
-        node_attributes = nx.get_node_attributes(G, "atom_type")
-        edge_attributes = nx.get_edge_attributes(G, "bond_type")
+        atom_types, bond_types = atom_codes(G), bond_codes(G)
+        return hash(tuple((u, v, atom_types[u], atom_types[v], bond_types[(u, v)]) for (u, v) in G.edges))
+    return hash(tuple(G.edges))
 
-    for i in range(len(G_edges)):
-        ## Adding molecule-related labels for the nodes in the linegraph
-        if molecule:
-            (u, v) = G_edges[i]
-            u_atom_type = node_attributes[u]
-            v_atom_type = node_attributes[v]
-            LG.add_node(i, atom_pair=set( [u_atom_type, v_atom_type] ), bond_type=edge_attributes[(u, v)] )
-        else:
-            LG.add_node(i)
-
-    ## O(n^2)
-    for i in range(len(G_edges)):
-        for j in range(i + 1,len(G_edges)):
-            if has_node_in_common(G_edges[i], G_edges[j]):
-                LG.add_edge(i, j)
+def cached_line_graph(G, molecule=False):
+    """
+        Returns line_graph(G, molecule), computing it only once per graph. The cache is keyed on the identity of G, and an entry
+        is only used if the fingerprint of G still matches, such that a graph modified in the meantime gets a new line graph.
+        Entries are dropped when G is garbage collected.
 
+        The returned line graph is shared between callers and must not be modified.
+
+        `Parameters`:
+            G (Graph): A NetworkX graph.
+        
+        `Optional`:
+            molecule (Boolean): See line_graph.
+        
+        `Returns`:
+            LG (Graph): The line graph of G.
+    """
+    fingerprint = graph_fingerprint(G, molecule)
+    graph_cache = _line_graph_cache.setdefault(G, {})
+    if molecule in graph_cache:
+        cached_fingerprint, LG = graph_cache[molecule]
+        if cached_fingerprint == fingerprint:
+            return LG
+
+    LG = line_graph(G, molecule)
+    graph_cache[molecule] = (fingerprint, LG)
     return LG
 
 ## used in Cliques
-def convert_edge_anchor_lg_list(L, edge_anchor):
+def convert_edge_anchor_lg_list(L, edge_anchor, edge_indices=None):
     """
     Computes the node_anchor of the line graphs made from the graphs in L based on edge_anchor.
 
     ``Parameters``:
         L (list (Graph)): A list of networkX graphs
         edge_anchor (list: list(edge)): A list of lists of edges. In edge_anchor[l], all edges are mapped to each other.
-                                        edge_anchor[l][i] is an edge from graph L[i].
+                                        edge_anchor[l][i] is an edge from graph L[i], in either orientation.
+
+    ``Optional``:
+        edge_indices (list (EdgeIndex)): The edge indices of the graphs in L, if already computed.
 
     ``Returns``:
         node_map ( list (list: nodes) ): The mapping of nodes in the linegraphs. An element is thus a list of edges mapped to each other.
@@ -71,11 +116,12 @@ def convert_edge_anchor_lg_list(L, edge_anchor):
     node_map = {}
 
     n_graphs = len(L)
-    ## list of edge lists from all graphs in L
-    edgelist = [list(L[i].edges) for i in range(n_graphs)]
+    ## edge indices of all graphs in L
+    if edge_indices is None:
+        edge_indices = [EdgeIndex(L[i]) for i in range(n_graphs)]
 
     ## Transform each [(u, v), (a, b), (x, y)] into [node_i, node_j, node_k] for every l
-    node_map = [ [ edgelist[i].index(l[i]) for i in range(n_graphs)] for l in edge_anchor]
+    node_map = [ [ edge_indices[i].index(l[i]) for i in range(n_graphs)] for l in edge_anchor]
 
     return node_map
 
@@ -1,14 +1,18 @@
 import matplotlib.pyplot as plt
 import networkx as nx
 import numpy as np
-from copy import deepcopy
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from workspace import Workspace
+from blockmarcs import BlockMARCS
 from linegraph import line_graph as lg
 from linegraph import convert_edge_anchor
+from edgeindex import EdgeIndex
+from graph_format import atom_codes, bond_codes
 from draw_graphs import draw_mcgregor_mcs_graphs
 
 ### Authors: Tobias Klink Lehn (toleh20@student.sdu.dk) and Kasper Halkjær Beider (kbeid20@student.sdu.dk)
-def mcs_mcgregor(G, H, edge_anchor=[], molecule=False):
+def mcs_mcgregor(G, H, edge_anchor=[], molecule=False, order="index", processes=None, split_depth=2, dense_marcs=False, branch=None, incumbent=None):
     """
     Computes the Maximum Common Subgraph using the Algorithm suggested by
     James J. McGregor in 1982.
@@ -16,16 +20,28 @@ def mcs_mcgregor(G, H, edge_anchor=[], molecule=False):
     `Precondition`: |V_G| <= |V_H|
 
         `Paramters`:
-            G (Graph): A NetworkX graph, nodes are integers but may be decorated with items
-            H (Graph): A NetworkX graph, nodes are integers but may be decorated with items
+            G (Graph): A NetworkX graph or CSRGraph, nodes are integers but may be decorated with items
+            H (Graph): A NetworkX graph or CSRGraph, nodes are integers but may be decorated with items
 
         `Optional`:
             anchor_point (dict: int -> int): A valid one-to-one mapping from ``n`` edges in G to ``n`` edgs in H.
+            molecule (boolean): If true, only nodes of the same atom type and edges of the same bond type are mapped. Default to false.
+            order (string): The order in which the nodes of G are mapped, see search_order. Every order finds mappings with the
+                            same maximum arcsleft, but the non-maximal mappings found on the way may differ. Default to "index".
+            processes (int): If given, the search is split into the subtrees below the first split_depth nodes of the order,
+                             which are searched by this many processes, see parallel_mcgregor. The result is the same as without.
+            split_depth (int): The number of nodes mapped before the search is split. Default to 2.
+            dense_marcs (boolean): If true, the MARCS of each mapping is returned as a dense |E_G| x |E_H| array instead of a
+                                   BlockMARCS. Default to false.
+            branch (tuple(int)): Only search the subtree where the first len(branch) nodes of the order are mapped to these nodes
+                                 in H. The mappings found are returned even if there are none. Used by parallel_mcgregor.
+            incumbent (tuple(Array, int)): The shared best arcsleft of every branch and the index of this branch. The search prunes
+                                           against the best arcsleft of earlier branches and stores its own. Used by parallel_mcgregor.
         
         `Returns`:
             all_mappings (list: (mapping, marcs, arcsleft)) where arcsleft is maximum:
                 mapping (dict: int -> int): The node correspondence for the MCS
-                marcs (np.array): The MARCS array for the MCS
+                marcs (BlockMARCS): The MARCS array for the MCS, or a dense np.array with dense_marcs
                 arcsleft (int): The number of arcs in G that can be mapped to arcs in H
 
     If an anchor point is given (i.e. a subgraph isomorphism between G and H),
@@ -36,55 +52,62 @@ def mcs_mcgregor(G, H, edge_anchor=[], molecule=False):
     G_node_amt, H_node_amt = len(G.nodes), len(H.nodes)
     G_edge_amt, H_edge_amt = len(G.edges), len(H.edges)
 
+    assert order in ("index", "degree", "anchor"), f"Unknown search order {order}"
     assert G_node_amt <= H_node_amt, f"The number of nodes in first input graph {G_node_amt} is larger than the number of nodes in the second input graph {H_node_amt}"
 
+    ## Labels are compared as interned integer codes
     if molecule:
-        G_atom_types, H_atom_types = nx.get_node_attributes(G, "atom_type"), nx.get_node_attributes(H, "atom_type")
-        G_bond_types, H_bond_types = nx.get_edge_attributes(G, "bond_type"), nx.get_edge_attributes(H, "bond_type")
+        G_atom_types, H_atom_types = atom_codes(G), atom_codes(H)
+        G_bond_types, H_bond_types = bond_codes(G), bond_codes(H)
     else: 
-        G_atom_types, H_atom_types = {i: "" for i in G.nodes}, {i: "" for i in H.nodes}
-        G_bond_types, H_bond_types = {i: "" for i in G.edges}, {i: "" for i in H.edges}
+        G_atom_types, H_atom_types = {i: 0 for i in G.nodes}, {i: 0 for i in H.nodes}
+        G_bond_types, H_bond_types = {i: 0 for i in G.edges}, {i: 0 for i in H.edges}
+
+    ## Edge ids of G and H, the rows and columns of MARCS
+    G_edge_index, H_edge_index = EdgeIndex(G), EdgeIndex(H)
 
     ## Auxiliary function
-    def node_to_arc_matrix(G):
+    def remove_ones(MARCS_row_ones, rows, removed, arcsleft):
         """
-        Computes a |V| x |E| matrix with (v, e) = 1 if
-        node `v` is incident with edge `e`.
+        Subtracts removed[i] from the number of ones left in row rows[i] and returns arcsleft, decremented once for
+        every row whose count reaches 0, as when the cells are removed one at a time.
         """
-        V_size = len(G.nodes)
-        A_size = len(G.edges)
-        
-        node_arc_matrix = np.zeros((V_size, A_size))
-        edges = list(G.edges)
-
-        ## Node pair (u, v) are both incident to the arc denoted by "Index"
-        for index in range(len(G.edges)):
-            (u, v) = edges[index]
-            node_arc_matrix[u][index] = 1
-            node_arc_matrix[v][index] = 1
-        
-        return node_arc_matrix
-    
-    def update_MARCS(MARCS, v_edges, x_edges, killed_edges, MARCS_row_ones, arcsleft):
+        before = MARCS_row_ones[rows]
+        after = before - removed
+        MARCS_row_ones[rows] = after
+        return arcsleft - np.count_nonzero((before > 0) & (after <= 0))
+
+    def update_MARCS(MARCS, v_cells, x_arcs, MARCS_row_ones, arcsleft):
         """
         Refines the MARCS matrix based on the edges connected to node v and node x.
         If edge 'i' is incident to node 'v' but edge 'j' is not incident with node 'x', then
-        MARCS[i][j] will be set to 0. killed_edges and arcsleft will be adjusted accordingly.
+        MARCS[i][j] will be set to 0. Returns the killed edges and the adjusted arcsleft.
+
+        v_cells is G_cells_of[v] and x_arcs is H_arcs_of[x]. The killed edges are given as (cells, v_arcs, removed), where cells
+        are the positions of the killed cells in MARCS.cells and removed[i] is the number of cells killed in row v_arcs[i].
         """
-        for G_edge in range(G_edge_amt):
-                ## v is incident to this arc.
-                if v_edges[G_edge] == 1:
-                    for H_edge in range(H_edge_amt):
-                        ## For all edges not incident with x, v edge cannot be mapped.
-                        if x_edges[H_edge] == 0:
-                            if MARCS[G_edge][H_edge] != 0:
-                                MARCS[G_edge][H_edge] = 0
-                                ## Take note of lacking edge correspondence for future restoration.
-                                killed_edges.append((G_edge, H_edge)) 
-                                MARCS_row_ones[G_edge] -= 1
-                                if MARCS_row_ones[G_edge] == 0:
-                                    arcsleft -= 1
-        return arcsleft
+        (v_arcs, cells, positions, columns) = v_cells
+        ## The cells of the arcs incident to v in the columns of arcs not incident to x
+        H_non_arcs[x_arcs] = False
+        killed = MARCS.cells[cells] & H_non_arcs[columns]
+        H_non_arcs[x_arcs] = True
+        killed_cells = cells[killed]
+        MARCS.cells[killed_cells] = False
+        removed = np.bincount(positions[killed], minlength=len(v_arcs))
+        arcsleft = remove_ones(MARCS_row_ones, v_arcs, removed, arcsleft)
+        return (killed_cells, v_arcs, removed), arcsleft
+
+    def restore_MARCS(MARCS, killed_edges, MARCS_row_ones, arcsleft):
+        """
+        Restores the cells killed by update_MARCS to 1 and returns arcsleft, incremented once for every row that
+        was all 0s before.
+        """
+        (cells, v_arcs, removed) = killed_edges
+        MARCS.cells[cells] = True
+        before = MARCS_row_ones[v_arcs]
+        after = before + removed
+        MARCS_row_ones[v_arcs] = after
+        return arcsleft + np.count_nonzero((before <= 0) & (after > 0))
 
     def modify_MARCS_anchor(MARCS, H_mapped, G_anchor_nodes, H_anchor_nodes, current_mapping, MARCS_row_ones, arcsleft):
         for G_node in G_anchor_nodes:
@@ -92,70 +115,82 @@ def mcs_mcgregor(G, H, edge_anchor=[], molecule=False):
         for H_node in H_anchor_nodes:
             H_mapped[H_node] = True
 
+        ## The row counts are those of the full |E_G| x |E_H| matrix, including the cells outside the blocks, which are
+        ## only removed by modify_MARCS_bond_type. The rows of the anchored edges and the edges incident to them are therefore
+        ## refined as full rows and written to their blocks at the end. All other rows only lose the anchored H-edges.
+        G_incident_of = [np.array(sorted(G_edge_index.incident_to(*anchors[0])), dtype=np.intp) for anchors in edge_anchor]
+        full_rows = {}
+        for (anchors, G_incident) in zip(edge_anchor, G_incident_of):
+            for row in [G_edge_index.index(anchors[0])] + G_incident.tolist():
+                full_rows[row] = np.ones(H_edge_amt, dtype=bool)
+        other_rows = np.array([row for row in range(G_edge_amt) if row not in full_rows], dtype=np.intp)
+        other_labels = np.asarray(G_labels, dtype=np.int64)[other_rows]
+
         ## refine MARCS such that no anchored edges can be mapped to anything
-        for anchors in edge_anchor:
-            G_edge = list(G.edges).index(anchors[0])
-            H_edge = list(H.edges).index(anchors[1])
+        for (anchors, G_incident) in zip(edge_anchor, G_incident_of):
+            G_edge = G_edge_index.index(anchors[0])
+            H_edge = H_edge_index.index(anchors[1])
 
             ## The anchor edge in G can only be mapped to the anchored edge in H (G row is set to 0 except for the anchor in H)
-            for i in range(H_edge_amt):
-                if i != H_edge:
-                    MARCS[G_edge][i] = 0
+            row = full_rows[G_edge]
+            anchor_cell = row[H_edge]
+            row[:] = False
+            row[H_edge] = anchor_cell
             ## Only one cell with the H-edge remains a 1
             MARCS_row_ones[G_edge] = 1
 
             ## H-column is set to 0 except for the anchor in G
-            for i in range(G_edge_amt):
-                if i != G_edge and MARCS[i][H_edge] == 1:
-                    MARCS[i][H_edge] = 0
-                    MARCS_row_ones[i] -= 1 ## A single cell in each row has been changed to 0
-                    if MARCS_row_ones[i] == 0: arcsleft -= 1
+            column = [r for r in full_rows if r != G_edge and full_rows[r][H_edge]]
+            for r in column:
+                full_rows[r][H_edge] = False
+            arcsleft = remove_ones(MARCS_row_ones, np.array(column, dtype=np.intp), 1, arcsleft)
+            ## The other rows still have all cells of the earlier anchored H-edges, which are distinct from H_edge
+            other_column = other_rows[other_labels == H_labels[H_edge]]
+            MARCS.cells[MARCS.cells_in_column(other_column, H_edge)] = False
+            arcsleft = remove_ones(MARCS_row_ones, other_rows, 1, arcsleft)
 
             ## Update such that only edges incident with u, v can be mapped to incident edges to r, s
-            (u, v) = anchors[0]
-            G_incident = list(G.edges(u)) + list(G.edges(v))
-
             (r, s) = anchors[1]
-            H_incident = list(H.edges(r)) + list(H.edges(s))
+            H_not_incident = np.ones(H_edge_amt, dtype=bool)
+            H_not_incident[list(H_edge_index.incident_to(r, s))] = False
 
             ## For all incident edges to this given anchor in G, only incident edges to the anchor in H may be mapped.
-            for g_edge in G_incident:
-                (g1, g2) = g_edge
-                try:
-                    g_edge_index = list(G.edges).index((g1, g2))
-                except:
-                    g_edge_index = list(G.edges).index((g2, g1))
-                for i in range(H_edge_amt):
-                    (h1, h2) = list(H.edges)[i]
-                    if (h1, h2) not in H_incident and (h2, h1) not in H_incident and MARCS[g_edge_index][i] == 1:
-                        MARCS[g_edge_index][i] = 0
-                        MARCS_row_ones[g_edge_index] -= 1
-                        if MARCS_row_ones[g_edge_index] == 0: arcsleft -= 1
+            removed = np.zeros(len(G_incident), dtype=np.int64)
+            for (i, G_row) in enumerate(G_incident.tolist()):
+                killed = full_rows[G_row] & H_not_incident
+                full_rows[G_row][killed] = False
+                removed[i] = np.count_nonzero(killed)
+            arcsleft = remove_ones(MARCS_row_ones, G_incident, removed, arcsleft)
+
+        for (row, full_row) in full_rows.items():
+            MARCS.cells[MARCS.row_range(row)] = full_row[MARCS.row_columns[row]]
             
         return arcsleft
 
-    def modify_MARCS_bond_type(MARCS, MARCS_row_ones, arcsleft, G_bond_types, H_bond_types):
-        G_edges = list(G.edges)
-        H_edges = list(H.edges)
-        for i in range(G_edge_amt):
-            for j in range(H_edge_amt):
-                if G_bond_types[G_edges[i]] != H_bond_types[H_edges[j]]:
-                    MARCS[i][j] = 0
-                    MARCS_row_ones[i] -= 1
-                    if MARCS_row_ones[i] == 0:
-                        arcsleft -= 1
-        return arcsleft
+    def modify_MARCS_bond_type(MARCS, MARCS_row_ones, arcsleft):
+        ## Every cell of differing bond types is removed from its row's count, also cells that were already 0. These are
+        ## the cells outside the blocks, which MARCS does not store.
+        widths = np.array([len(columns) for columns in MARCS.row_columns], dtype=np.int64)
+        return remove_ones(MARCS_row_ones, np.arange(G_edge_amt), H_edge_amt - widths, arcsleft)
 
-    G_node_to_arc, H_node_to_arc = node_to_arc_matrix(G), node_to_arc_matrix(H)
+    ## G_arcs_of[v] is the array of ids of the arcs incident to v, the rows of MARCS changed when mapping v
+    G_arcs_of = [np.array(G_edge_index.incident[v], dtype=np.intp) for v in range(G_node_amt)]
+    ## H_arcs_of[x] is the array of ids of the arcs incident to x. The columns killed when mapping to x are those of the arcs
+    ## not incident to x, which are True in H_non_arcs while update_MARCS sets the arcs of x to False.
+    H_arcs_of = [np.array(H_edge_index.incident[x], dtype=np.intp) for x in range(H_node_amt)]
+    H_non_arcs = np.ones(H_edge_amt, dtype=bool)
 
     G_anchor_nodes, H_anchor_nodes = convert_edge_anchor(edge_anchor)
 
-    ## Initialize the ARC Matrix (q1 x q2) to be full of 1's (all arcs are compatible)
-    MARCS = np.ones((G_edge_amt, H_edge_amt))
+    ## Initialize the ARC Matrix (q1 x q2) to be full of 1's (all arcs are compatible). It only stores the blocks of edges with
+    ## equal bond types (a single block without labels), as all other cells are 0 after modify_MARCS_bond_type.
+    G_labels = [G_bond_types[edge] for edge in G_edge_index.edges]
+    H_labels = [H_bond_types[edge] for edge in H_edge_index.edges]
+    MARCS = BlockMARCS(G_labels, H_labels)
 
     ## Counting array to determine whether a row in MARCS has been reduced to all zeros
     ## used to maintain "arcsleft" instead of iterating through a row in MARCS every time a value is adjusted.
-    MARCS_row_ones = [H_edge_amt for i in range(G_edge_amt)]
+    MARCS_row_ones = np.full(G_edge_amt, H_edge_amt, dtype=np.int64)
 
     ## H_mapped[i] = 1 if node "i" in H has already been assigned a vertex from G
     ## In place to ensure that a node in G in a branch isn't mapped
@@ -167,17 +202,20 @@ def mcs_mcgregor(G, H, edge_anchor=[], molecule=False):
     ## multiple times.
     H_tried = np.zeros((G_node_amt, H_node_amt), dtype=bool)
 
-    ## Array to save workspaces containing MARCS, arcsleft, MARCS_row_ones , and killed_edges
+    ## Array to save workspaces containing arcsleft and killed_edges for each depth. Together they form a trail of the changes made to MARCS
+    ## by the nodes on the current branch, which are undone when backtracking instead of copying MARCS for every node.
     workspaces = [0 for i in range(G_node_amt)]
 
-    ## The current G -> H function, MARCSs and arcs_left
+    ## The current G -> H function, and the (mapping, arcs_left) pairs found
     current_mapping = {}
-    all_mappings = []
+    found_mappings = []
     for node_index in range(G_node_amt):
         current_mapping[node_index] = ""
 
-    ## Contains (i, j) pairs when edges (i, j) were recently unable to correspond to each other.
-    killed_edges = []
+    ## Contains the (i, j) cells when edges (i, j) were recently unable to correspond to each other, as returned by update_MARCS.
+    no_edges = np.zeros(0, dtype=np.intp)
+    no_killed_edges = (no_edges, no_edges, no_edges)
+    killed_edges = no_killed_edges
     
     ## Number of total mappings found.
     counter = 0
@@ -191,111 +229,260 @@ def mcs_mcgregor(G, H, edge_anchor=[], molecule=False):
     ## bond types.
 
     if molecule:
-        arcsleft = modify_MARCS_bond_type(MARCS, MARCS_row_ones, arcsleft, G_bond_types, H_bond_types)
+        arcsleft = modify_MARCS_bond_type(MARCS, MARCS_row_ones, arcsleft)
+
+    ## G_cells_of[v] is (G_arcs_of[v], cells, positions, columns) with the cells of MARCS in the rows of the arcs incident
+    ## to v, as given by MARCS.cells_of
+    G_cells_of = [(v_arcs,) + MARCS.cells_of(v_arcs.tolist()) for v_arcs in G_arcs_of]
+
+    ## MARCS before any node is mapped, from which the MARCS of a found mapping is rebuilt
+    initial_MARCS, initial_MARCS_row_ones, initial_arcsleft = MARCS.copy(), MARCS_row_ones.copy(), arcsleft
+
+    def replay_MARCS(mapping):
+        """
+        Rebuilds the MARCS of a found mapping by applying its node assignments to the initial MARCS, in the order
+        the search made them.
+        """
+        MARCS, MARCS_row_ones, arcsleft = initial_MARCS.copy(), initial_MARCS_row_ones.copy(), initial_arcsleft
+        for G_node in G_order:
+            H_node = mapping[G_node]
+            if H_node != "":
+                _, arcsleft = update_MARCS(MARCS, G_cells_of[G_node], H_arcs_of[H_node], MARCS_row_ones, arcsleft)
+        return MARCS.to_dense() if dense_marcs else MARCS
         
-    ## v in G, x in H
-    v = 0
-    x = None
-    ## Find first node in G not a part of anchor point (lexicographic order)
-    while v in G_anchor_nodes:
-        v += 1
+    ## The non-anchored nodes of G in the order they are mapped, the node at depth `d` of the search is G_order[d]
+    G_order = search_order(G, G_anchor_nodes, order)
 
     ## In case all nodes in G are anchored, the algorithm needs not to run.
-    if v >= G_node_amt:
-        return current_mapping, MARCS, arcsleft
-    first_non_anchor = v
+    if not G_order:
+        return current_mapping, MARCS.to_dense() if dense_marcs else MARCS, arcsleft
+
+    ## H_candidates[v] is the list of nodes in H with the atom type of v, the only nodes v may be mapped to
+    H_candidates = {v: [x for x in range(H_node_amt) if G_atom_types[v] == H_atom_types[x]] for v in G_order}
+
+    ## Every node of G must be mapped to a node of H with the same atom type. labels_needed[d][l] is the number of nodes
+    ## with label `l` after depth `d`, and H_free_labels[l] is the number of unmapped nodes in H with label `l`.
+    ## A branch where labels_needed exceeds H_free_labels for some label cannot be completed and is not explored.
+    label_index = {label: l for (l, label) in enumerate(sorted(set(G_atom_types.values()) | set(H_atom_types.values())))}
+    labels_needed = np.zeros((len(G_order), len(label_index)), dtype=np.int64)
+    for d in range(len(G_order) - 2, -1, -1):
+        labels_needed[d] = labels_needed[d + 1]
+        labels_needed[d][label_index[G_atom_types[G_order[d + 1]]]] += 1
+    H_free_labels = np.zeros(len(label_index), dtype=np.int64)
+    for H_node in range(H_node_amt):
+        if not H_mapped[H_node]:
+            H_free_labels[label_index[H_atom_types[H_node]]] += 1
+
+    def map_H_node(H_node, mapped):
+        H_mapped[H_node] = mapped
+        H_free_labels[label_index[H_atom_types[H_node]]] += -1 if mapped else 1
+
+    ## Every way to map the first split_depth nodes of the order is a branch, in the order the search would visit them
+    if processes and branch is None and len(G_order) > split_depth:
+        branches = []
+        def extend_branch(partial_branch):
+            if len(partial_branch) == split_depth:
+                branches.append(tuple(partial_branch))
+                return
+            for H_node in H_candidates[G_order[len(partial_branch)]]:
+                if not H_mapped[H_node] and H_node not in partial_branch:
+                    extend_branch(partial_branch + [H_node])
+        extend_branch([])
+        all_mappings = parallel_mcgregor((G, H, edge_anchor, molecule, order), branches, processes)
+        if dense_marcs:
+            all_mappings = [(mapping, marcs.to_dense(), arcsleft) for (mapping, marcs, arcsleft) in all_mappings]
+        return all_mappings
+
+    def earlier_best():
+        """
+        The best arcsleft found so far by the branches before this one, which is at most the best arcsleft a sequential
+        search has when it reaches this branch.
+        """
+        (incumbents, index) = incumbent
+        return max(incumbents[:index], default=0)
+
+    ## Map the nodes of branch, the search then runs below it and stops when backtracking out of it
+    start_depth = 0
+    if branch is not None:
+        if incumbent is not None:
+            bestarcsleft = earlier_best()
+        for x in branch:
+            v = G_order[start_depth]
+            map_H_node(x, True)
+            current_mapping[v] = x
+            _, arcsleft = update_MARCS(MARCS, G_cells_of[v], H_arcs_of[x], MARCS_row_ones, arcsleft)
+            if arcsleft <= bestarcsleft or np.any(labels_needed[start_depth] > H_free_labels):
+                return []
+            start_depth += 1
+    ## Number of loop iterations, the bound from earlier branches is refreshed every 256 iterations
+    steps = 0
+
+    ## Depth of the search, v in G, x in H
+    depth = start_depth
+    v = G_order[depth]
+    x = None
     
     #####################################################################################################################
     ##                                              ALGORITHM BEGINS HERE                                              ##
     #####################################################################################################################
-    while v >= 0: 
+    while depth >= start_depth: 
         x = None
+        steps += 1
+        if incumbent is not None and steps % 256 == 0:
+            bestarcsleft = max(bestarcsleft, earlier_best())
 
         ## Finding a node x in H that has not already been mapped to.  
         ## Additionally, that node x in H has not been tried yet by node v in G
-        for H_node in range(H_node_amt):
-            if not H_tried[v][H_node] and not H_mapped[H_node] and G_atom_types[v] == H_atom_types[H_node]:
+        for H_node in H_candidates[v]:
+            if not H_tried[v][H_node] and not H_mapped[H_node]:
                 x = H_node
                 ## If v is currently mapped to a different node
                 ## update said node to no longer be mapped.
                 if current_mapping[v] != "":
-                    H_mapped[ current_mapping[ v ] ] = False
+                    map_H_node(current_mapping[v], False)
 
                 ## Upon mapping to a different node in H, the edges killed as a result
                 ## of the previous mapping must now be restored
-                for (G_edge, H_edge) in killed_edges:
-                    if MARCS[G_edge][H_edge] == 0:
-                        MARCS[G_edge][H_edge] = 1
-                        if MARCS_row_ones[G_edge] == 0:
-                            arcsleft += 1  
-                        MARCS_row_ones[G_edge] += 1
+                arcsleft = restore_MARCS(MARCS, killed_edges, MARCS_row_ones, arcsleft)
 
                 current_mapping[v] = x
                 break
         ## Vertex is found
         if x is not None:
             H_tried[v][x] = True
-            H_mapped[x] = True
+            map_H_node(x, True)
             
             ## UPDATE MARCS
-            killed_edges = []
-            v_edges = G_node_to_arc[v]
-            x_edges = H_node_to_arc[x]
-            
-            arcsleft = update_MARCS(MARCS, v_edges, x_edges, killed_edges, MARCS_row_ones, arcsleft)
+            killed_edges, arcsleft = update_MARCS(MARCS, G_cells_of[v], H_arcs_of[x], MARCS_row_ones, arcsleft)
 
             ## If the number of edges to be mapped is 'high', we either build further down the branch
             ## or save the current mapping if in a leaf node.
             if arcsleft > bestarcsleft:        ## == comes from building all MCS, even ones where arcsleft are equal
-                if v == G_node_amt - 1:
-                    all_mappings.append((deepcopy(current_mapping), deepcopy(MARCS), arcsleft))
+                if depth == len(G_order) - 1:
+                    found_mappings.append((dict(current_mapping), arcsleft))
                     bestarcsleft = arcsleft
-                else:
-                    ## Store values in workspace associated with node v
-                    workspaces[v] = Workspace(MARCS, arcsleft, MARCS_row_ones, killed_edges)
-
-                    non_anchored_node = v
-                    v += 1
-                    while v in G_anchor_nodes and v < G_node_amt:
-                        v += 1
-                    ## Skipping ahead resulted in jumping "out" of G, so we must backtrack to most
-                    ## recent non-anchored node and save this mapping.
-                    if v == G_node_amt:
-                        all_mappings.append((deepcopy(current_mapping), deepcopy(MARCS), arcsleft))
-                        bestarcsleft = arcsleft
-                        v = non_anchored_node
-                    ## New branch made, no edges killed and no nodes in H
-                    ## have been tried in this branch.
-                    else:
-                        killed_edges = []
-                        H_tried[v] = [False for i in range(H_node_amt)]
+                    if incumbent is not None:
+                        incumbent[0][incumbent[1]] = arcsleft
+                ## New branch made, no edges killed and no nodes in H
+                ## have been tried in this branch.
+                elif np.all(labels_needed[depth] <= H_free_labels):
+                    ## Store values in workspace associated with depth
+                    workspaces[depth] = Workspace(arcsleft, killed_edges)
+
+                    depth += 1
+                    v = G_order[depth]
+                    killed_edges = no_killed_edges
+                    H_tried[v] = False
 
         ## No node in H was found - backtracking is the only option.
         else:
-            ## When backtracking, ignore the tentative mapping of v in G to x in H.
+            ## When backtracking, ignore the tentative mapping of v in G to x in H and undo its changes to MARCS.
+            arcsleft = restore_MARCS(MARCS, killed_edges, MARCS_row_ones, arcsleft)
             if current_mapping[v] != "":
-                H_mapped[ current_mapping[ v ] ] = False
+                map_H_node(current_mapping[v], False)
                 current_mapping[v] = ""
 
-            ## When backtracking the algorithm continues backtracking until it reaches
-            ## a non anchor point.
-            v -= 1
-            while v in G_anchor_nodes and v > first_non_anchor:
-                v -= 1
+            depth -= 1
             
             ## If the algorithm has backtracked past the first non anchor point it means
             ## there are only anchor points left, therefore the algorithm stops.
-            if v < first_non_anchor:
+            if depth < start_depth:
+                all_mappings = [(mapping, replay_MARCS(mapping), arcsleft) for (mapping, arcsleft) in found_mappings]
+                if branch is not None:
+                    return all_mappings
                 ## return only max
                 max_arcsleft = max(all_mappings, key=lambda items:items[2])[2]
                 all_mappings_filtered = list(filter(lambda x: x[2] == max_arcsleft, all_mappings))
                 return all_mappings
-            ## Restore the saved workspace
-            MARCS = workspaces[v].get_MARCS()
-            arcsleft = workspaces[v].get_arcsleft()
-            MARCS_row_ones = workspaces[v].get_MARCS_ones_left()
-            killed_edges = workspaces[v].get_edges_killed()
+            ## Restore the saved workspace, MARCS is back in the state after mapping v
+            v = G_order[depth]
+            arcsleft = workspaces[depth].get_arcsleft()
+            killed_edges = workspaces[depth].get_edges_killed()
+
+
+## Arguments of mcs_mcgregor and the shared best arcsleft of every branch in a worker process, set once per process by _init_worker
+_worker_args = None
+_worker_incumbents = None
+
+def _init_worker(args, incumbents):
+    global _worker_args, _worker_incumbents
+    _worker_args = args
+    _worker_incumbents = incumbents
+
+def _search_branch(indexed_branch):
+    (index, branch) = indexed_branch
+    return mcs_mcgregor(*_worker_args, branch=branch, incumbent=(_worker_incumbents, index))
+
+def parallel_mcgregor(args, branches, processes):
+    """
+        Runs mcs_mcgregor on each branch in a pool of processes and combines the results into those of a sequential run.
+
+        Each branch records the best arcsleft it has found in a shared array and prunes against the best arcsleft of the
+        branches before it. That bound is never larger than the one a sequential run has at the start of the branch, so every
+        mapping the sequential run finds is found as well. The results are concatenated in branch order, and only mappings
+        improving on all mappings before them are kept, which are exactly the mappings of the sequential run.
+
+        `Parameters`:
+            args (tuple): The positional arguments of mcs_mcgregor, (G, H, edge_anchor, molecule, order)
+            branches (list: tuple(int)): The branches, in the order a sequential run visits them
+            processes (int): The number of worker processes
+
+        `Returns`:
+            all_mappings (list: (mapping, marcs, arcsleft)): As returned by mcs_mcgregor
+    """
+    incumbents = multiprocessing.Array("q", len(branches), lock=False)
+    all_mappings = []
+    bestarcsleft = 0
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(args, incumbents)) as executor:
+        for branch_mappings in executor.map(_search_branch, enumerate(branches)):
+            for (mapping, marcs, arcsleft) in branch_mappings:
+                if arcsleft > bestarcsleft:
+                    all_mappings.append((mapping, marcs, arcsleft))
+                    bestarcsleft = arcsleft
+    ## As in a sequential run, where max of no mappings raises a ValueError
+    if not all_mappings:
+        raise ValueError("mcs_mcgregor found no mappings")
+    return all_mappings
+
+def search_order(G, anchor_nodes, order="index"):
+    """
+        Computes the order in which mcs_mcgregor maps the non-anchored nodes of G.
 
+        `Parameters`:
+            G (Graph): A NetworkX graph with nodes 0, 1, ..., n - 1
+            anchor_nodes (iterable(int)): The anchored nodes of G, which are left out
+
+        `Optional`:
+            order (string): One of
+                "index": Increasing node index, the order of the original algorithm.
+                "degree": Decreasing degree, such that the nodes killing the most MARCS cells are mapped first.
+                "anchor": Increasing distance to the anchor (or to a node of highest degree if there is no anchor), such that
+                          every node is mapped next to already mapped nodes and arcs are killed early.
+                Ties are broken by node index. Default to "index".
+
+        `Returns`:
+            G_order (list: int): The non-anchored nodes of G in the order they are mapped
+    """
+    anchor_nodes = set(anchor_nodes)
+    nodes = [v for v in range(len(G.nodes)) if v not in anchor_nodes]
+    if order == "degree":
+        return sorted(nodes, key=lambda v: -len(G.adj[v]))
+    if order == "anchor":
+        ## Breadth first search from all anchor nodes at once
+        sources = sorted(anchor_nodes) if anchor_nodes else [max(nodes, key=lambda v: len(G.adj[v]))]
+        distance = {source: 0 for source in sources}
+        frontier = sources
+        while frontier:
+            next_frontier = []
+            for u in frontier:
+                for w in G.adj[u]:
+                    if w not in distance:
+                        distance[w] = distance[u] + 1
+                        next_frontier.append(w)
+            frontier = next_frontier
+        ## Nodes unreachable from the anchor come last
+        return sorted(nodes, key=lambda v: distance.get(v, len(G.nodes)))
+    return nodes
 
 def construct_cs(G, marcs):
     """
@@ -1,6 +1,8 @@
 import networkx as nx
 from queue import Queue
 from draw_graphs import draw_one_graph
+from csrgraph import CSRGraph
+import graph_format
 import copy 
 
 def BFS_w_distance(G, anchored_nodes):
@@ -75,28 +77,105 @@ def anchor_reach(L, A):
 def shrink_graphs(L, shortest_distance, distance_map):
     """ 
         `Parameters`
-            L (list: Graph):  A list of graphs
+            L (list: Graph):  A list of graphs, NetworkX graphs or CSRGraphs
             shortest_distance (Int): The distance to shrink the graph to
             distance_map (dict: int -> [int]): A dictionary s.t. distance_map[0][i] is the distance from node i to the anchor in graph 0
         
         `Returns`
             Copies of the given graphs shrunk to the distance given by shortest_distance.  
     """
-    ## Protection against introducing unintended side effects
-    copied_graphs = [copy.deepcopy(graph) for graph in L]
-
-    for i in range(len(copied_graphs)):
-        graph = copied_graphs[i]
+    shrunk_graphs = []
+    for i in range(len(L)):
+        graph = L[i]
         distances = distance_map[i]
+        far_nodes = [nodes for nodes in distances if distances[nodes] > shortest_distance]
+
+        ## CSRGraphs are immutable, their shrunk copy is the subgraph induced by the remaining nodes
+        if isinstance(graph, CSRGraph):
+            far_nodes = set(far_nodes)
+            shrunk_graphs.append(graph.subgraph([node for node in graph.nodes if node not in far_nodes]))
+            continue
+
+        ## Protection against introducing unintended side effects
+        graph = copy.deepcopy(graph)
         
         ## Remove all nodes further away than the max distance
-        for nodes in distances:
-            if distances[nodes] > shortest_distance:
-                graph.remove_node(nodes)
+        graph.remove_nodes_from(far_nodes)
+        shrunk_graphs.append(graph)
 
-    return copied_graphs
-    
-        
-    
+    return shrunk_graphs
+
+def plan_graph_order(L, A, molecule=False):
+    """
+        Picks an order of the graphs in L for the iterative approach, which solves L[0] against L[1], the result against L[2] and so on.
+        The size of each product graph is estimated from the edge label histograms of the graphs, counting only edges within the
+        anchor reach (see anchor_reach): edges only pair with edges of the same label, and two pairs are adjacent when both
+        edges are adjacent in their graphs. The graphs solved later are matched against a common subgraph, whose histogram is
+        at most the smallest of the histograms so far.
+        The first pair is the one with the smallest estimated product graph, and each next graph is the one with the smallest
+        estimated product graph against the common subgraph so far.
+
+        `Parameters`
+            L (list: Graph):  A list of graphs, NetworkX graphs or CSRGraphs
+            A (list: Edge): A list of anchored edges in each graph. E.g. A[0] all anchored edges in L[0] etc.
+
+        `Optional`
+            molecule (boolean): If true, edges are labelled by their atom pair and bond type, otherwise all edges have the same label. Default to false.
+
+        `Returns`
+            order (list: int): The indices of the graphs of L in the order to solve them.
+    """
+    if len(L) <= 2:
+        return list(range(len(L)))
+
+    distance_map, shortest_distance = anchor_reach(L, A)
+
+    ## histograms[i] maps each edge label to its number of edges within reach in L[i], adjacencies[i] is the number of pairs of
+    ## adjacent edges within reach, i.e. the edges of the line graph
+    histograms = []
+    adjacencies = []
+    for i in range(len(L)):
+        graph = L[i]
+        distances = distance_map[i]
+        if molecule:
+            atom_types = graph_format.atom_codes(graph)
+            bond_types = graph_format.bond_codes(graph)
+        histogram = {}
+        degrees = {}
+        for (u, v) in graph.edges:
+            if distances.get(u, shortest_distance + 1) > shortest_distance or distances.get(v, shortest_distance + 1) > shortest_distance:
+                continue
+            label = (graph_format.atom_pair_code(atom_types[u], atom_types[v]), bond_types[(u, v)]) if molecule else None
+            histogram[label] = histogram.get(label, 0) + 1
+            degrees[u] = degrees.get(u, 0) + 1
+            degrees[v] = degrees.get(v, 0) + 1
+        histograms.append(histogram)
+        adjacencies.append(sum(degree * (degree - 1) // 2 for degree in degrees.values()))
+
+    def product_size(histogram_one, adjacency_one, histogram_two, adjacency_two):
+        """
+            Estimated number of nodes and edges of the product graph of two graphs.
+        """
+        nodes = sum(count * histogram_two.get(label, 0) for (label, count) in histogram_one.items())
+        all_pairs = sum(histogram_one.values()) * sum(histogram_two.values())
+        if not all_pairs:
+            return 0
+        ## Each pair of adjacent edges in one graph and in the other gives two edges, when both pairs of edges have equal labels
+        edges = 2 * adjacency_one * adjacency_two * nodes / all_pairs
+        return nodes + edges
+
+    ## The first pair, lowest indices first among equal estimates
+    pairs = [(i, j) for i in range(len(L)) for j in range(i + 1, len(L))]
+    (first, second) = min(pairs, key=lambda pair: product_size(histograms[pair[0]], adjacencies[pair[0]], histograms[pair[1]], adjacencies[pair[1]]))
+    order = [first, second]
+    histogram = {label: min(count, histograms[second].get(label, 0)) for (label, count) in histograms[first].items()}
+    adjacency = min(adjacencies[first], adjacencies[second])
+
+    while len(order) < len(L):
+        remaining = [i for i in range(len(L)) if i not in order]
+        next_graph = min(remaining, key=lambda i: product_size(histogram, adjacency, histograms[i], adjacencies[i]))
+        order.append(next_graph)
+        histogram = {label: min(count, histograms[next_graph].get(label, 0)) for (label, count) in histogram.items()}
+        adjacency = min(adjacency, adjacencies[next_graph])
 
-    
\ No newline at end of file
+    return order
@@ -1,5 +1,8 @@
 import networkx as nx
+import numpy as np
 import itertools
+from array import array
+from collections import OrderedDict
 
 def _has_node_in_common(u, v, n_coordinates):
     for i in range(n_coordinates):
@@ -8,22 +11,32 @@ def _has_node_in_common(u, v, n_coordinates):
     return False
 
 ### Authors: Tobias Klink Lehn (toleh20@student.sdu.dk) and Kasper Halkjær Beider (kbeid20@student.sdu.dk)
-def product_graph_no_limit(L):
+def product_graph_no_limit(L, split=False, compact=False):
     """
         Computes the modular product of a list of graphs. Edges in the returned modular product are decorated with red/blue colors
         following the definition of the modular product.
+
+        If split is true, the product graph is returned as a ColoredProductGraph with separate blue and red adjacency.
+        If compact is true, the ColoredProductGraph stores its nodes as mixed-radix integer codes (implies split).
     """
 
-    product_graph = nx.Graph()
+    if compact:
+        product_graph = ColoredProductGraph(radices=[len(g.nodes) for g in L])
+    else:
+        product_graph = ColoredProductGraph() if split else nx.Graph()
     ## Computes the cartesian products of the two node sets (sorted)
     node_list = [sorted(list(g.nodes)) for g in L]
-    product_nodes = list(itertools.product(*node_list))
     n_graphs = len(L)
 
-    product_graph.add_nodes_from(product_nodes)
-    node_count = len(product_graph.nodes)
-
-    product_graph_nodes = list(product_graph.nodes)
+    ## A compact graph is filled with the codes of the product nodes, and decodes a product node whenever it is looked at
+    ## instead of keeping a list of all product node tuples.
+    if compact:
+        product_graph.add_nodes_from(map(int, _product_codes(node_list, product_graph.radices)))
+        product_graph_nodes = product_graph.nodes
+    else:
+        product_graph.add_nodes_from(itertools.product(*node_list))
+        product_graph_nodes = list(product_graph.nodes)
+    node_count = len(product_graph_nodes)
 
     for i in range(node_count):
         ## v = (v_1, v_2, ..., v_n)
@@ -65,7 +78,181 @@ def product_graph_no_limit(L):
 
     return product_graph 
 
-def product_graph_limit(L, anchor_nodes, molecule=False):
+def _adjacency_matrices(L, node_list):
+    """
+        Computes a boolean adjacency matrix for every graph in L. Row/column 'k' of matrix 'i' corresponds to
+        node node_list[i][k] in L[i].
+    """
+    matrices = []
+    for i in range(len(L)):
+        position = {node: k for k, node in enumerate(node_list[i])}
+        adjacency = np.zeros((len(node_list[i]), len(node_list[i])), dtype=bool)
+        for (u, v) in L[i].edges:
+            adjacency[position[u], position[v]] = True
+            adjacency[position[v], position[u]] = True
+        matrices.append(adjacency)
+    return matrices
+
+def _kronecker(matrices):
+    """
+        Computes the boolean Kronecker product of all matrices in the given list.
+    """
+    product = np.ones((1, 1), dtype=bool)
+    for matrix in matrices:
+        product = np.kron(product, matrix).astype(bool)
+    return product
+
+def product_graph_no_limit_vectorized(L, split=False, compact=False):
+    """
+        Computes the same modular product as product_graph_no_limit, but determines the red/blue edges with NumPy
+        instead of comparing every pair of product nodes coordinate by coordinate.
+
+        Product nodes are enumerated in the order of itertools.product, which is the row-major order of the
+        Kronecker product. Two product nodes u and v are therefore connected by a blue edge iff entry (u, v) of
+        A_1 x A_2 x ... x A_n is set, where A_i is the adjacency matrix of L[i]. Likewise, they are connected
+        by a red edge iff entry (u, v) of C_1 x C_2 x ... x C_n is set, where C_i marks the pairs of distinct
+        non-adjacent nodes in L[i]. The matrices are evaluated in blocks of rows sharing their first coordinate,
+        such that only a 1/|V(L[0])| fraction of the N x N product is kept in memory at any time.
+
+        `Parameters`:
+            L (list(Graph)): A list of NetworkX graphs
+
+        `Optional`:
+            split (Boolean): If true, the product graph is returned as a ColoredProductGraph, whose blue/red bitsets are
+                             packed directly from the rows of the Kronecker products.
+            compact (Boolean): If true, the ColoredProductGraph stores its nodes as mixed-radix integer codes (implies split).
+                               As product nodes are enumerated in row-major order, the code of product node 'k' is 'k'.
+        
+        `Returns`:
+            product_graph (Graph): The modular product of all graphs in L, edges decorated with a "color" attribute.
+    """
+
+    node_list = [sorted(list(g.nodes)) for g in L]
+    if compact:
+        split = True
+        product_graph = ColoredProductGraph(radices=[len(nodes) for nodes in node_list])
+        product_graph.add_nodes_from(range(int(np.prod([len(nodes) for nodes in node_list]))))
+    else:
+        product_graph = ColoredProductGraph() if split else nx.Graph()
+        product_nodes = list(itertools.product(*node_list))
+        product_graph.add_nodes_from(product_nodes)
+
+    if not product_graph.nodes:
+        return product_graph
+
+    adjacency = _adjacency_matrices(L, node_list)
+    ## Pairs of distinct, non-adjacent nodes
+    non_adjacency = [~matrix & ~np.eye(len(matrix), dtype=bool) for matrix in adjacency]
+
+    ## Kronecker products of all coordinates but the first, shared by all row blocks
+    blue_rest = _kronecker(adjacency[1:])
+    red_rest = _kronecker(non_adjacency[1:])
+    block_size = len(blue_rest)
+
+    for first in range(len(node_list[0])):
+        blue_block = np.kron(adjacency[0][first], blue_rest).astype(bool)
+        red_block = np.kron(non_adjacency[0][first], red_rest).astype(bool)
+        offset = first * block_size
+
+        if split:
+            blue_rows = np.packbits(blue_block, axis=1, bitorder="little")
+            red_rows = np.packbits(red_block, axis=1, bitorder="little")
+            for i in range(block_size):
+                product_graph.set_neighbourhood(offset + i, int.from_bytes(blue_rows[i].tobytes(), "little"), int.from_bytes(red_rows[i].tobytes(), "little"))
+            continue
+
+        ## Only consider pairs (i, j) with i < j, edges are undirected
+        upper = np.arange(len(node_list[0]) * block_size)[None, :] > (offset + np.arange(block_size))[:, None]
+        rows, columns = np.nonzero((blue_block | red_block) & upper)
+        colors = blue_block[rows, columns]
+
+        product_graph.add_edges_from(
+            (product_nodes[offset + i], product_nodes[j], {"color": "blue" if is_blue else "red"})
+            for i, j, is_blue in zip(rows.tolist(), columns.tolist(), colors.tolist())
+        )
+
+    return product_graph
+
+def _label_bucketed_product(node_list, labels, radices=None):
+    """
+        Computes the product nodes whose coordinates all carry the same label, in the same (lexicographic) order
+        as itertools.product would produce them. The nodes of each graph are bucketed by their label
+        such that only the cartesian products of matching buckets are generated.
+
+        `Parameters`:
+            node_list (list(list(node))): node_list[i] is the sorted list of candidate nodes in graph i
+            labels (list(dict)): labels[i][node] is a hashable label of node in graph i
+            radices (list(int)): If given, the product nodes are returned as a NumPy array of mixed-radix codes instead of tuples
+    """
+    buckets = []
+    for i in range(len(node_list)):
+        graph_buckets = {}
+        for node in node_list[i]:
+            graph_buckets.setdefault(labels[i][node], []).append(node)
+        buckets.append(graph_buckets)
+
+    ## Only labels present in all graphs can give rise to product nodes
+    shared_labels = [label for label in buckets[0] if all(label in graph_buckets for graph_buckets in buckets)]
+    
+    if radices is not None:
+        codes = [_product_codes([graph_buckets[label] for graph_buckets in buckets], radices) for label in shared_labels]
+        return np.sort(np.concatenate(codes)) if codes else np.zeros(0, dtype=np.int64)
+
+    product_nodes = []
+    for label in shared_labels:
+        product_nodes.extend(itertools.product(*[graph_buckets[label] for graph_buckets in buckets]))
+    
+    return sorted(product_nodes)
+
+def _strides(radices):
+    """
+        Computes the place values of a mixed-radix number system with the given radices (last coordinate least significant).
+    """
+    strides = [1] * len(radices)
+    for i in range(len(radices) - 2, -1, -1):
+        strides[i] = strides[i + 1] * radices[i + 1]
+    return strides
+
+def encode_product_node(node, radices):
+    """
+        Encodes product node (v_1, v_2, ..., v_n) as the single integer v_1 * r_2 * ... * r_n + ... + v_n, where radices = [r_1, ..., r_n]
+        are the node counts of the graphs in the product. Codes preserve the lexicographic order of the product nodes.
+    """
+    code = 0
+    for i in range(len(radices)):
+        code = code * radices[i] + node[i]
+    return code
+
+def decode_product_node(code, radices):
+    """
+        Decodes an integer computed by encode_product_node back into the product node (v_1, v_2, ..., v_n).
+    """
+    node = [0] * len(radices)
+    for i in range(len(radices) - 1, -1, -1):
+        code, node[i] = divmod(code, radices[i])
+    return tuple(node)
+
+def _product_codes(node_list, radices):
+    """
+        Computes the mixed-radix codes of all product nodes in the cartesian product of the node lists, in lexicographic order.
+    """
+    codes = np.zeros(1, dtype=np.int64)
+    for nodes, stride in zip(node_list, _strides(radices)):
+        codes = np.add.outer(codes, np.asarray(nodes, dtype=np.int64) * stride).ravel()
+    return codes
+
+def _molecule_labels(L):
+    """
+        Computes, for each line graph in L, a dictionary from nodes to their (atom_pair, bond_type) label of interned integer codes.
+    """
+    labels = []
+    for graph in L:
+        atom_pairs = dict(graph.nodes(data="atom_pair"))
+        bond_types = dict(graph.nodes(data="bond_type"))
+        labels.append({node: (atom_pairs[node], bond_types[node]) for node in graph.nodes})
+    return labels
+
+def product_graph_limit(L, anchor_nodes, molecule=False, split=False, compact=False):
     """
         Computes the modular product of all NetworkX graphs contained in L.
         With that, node lg_node_anchor[u][0] is also mapped to lg_node_anchpr[u][1] ... and so forth.
@@ -78,6 +265,10 @@ def product_graph_limit(L, anchor_nodes, molecule=False):
             L: List of graphs
             anchor_nodes: list of anchor nodes in the product graph of the form (v_1, v_2, ..., v_n)
             molecule (Boolean): Indicates whether the graphs are decorated with molecule attributes or not
+            split (Boolean): Indicates whether the product graph should be a ColoredProductGraph, keeping blue and red edges apart,
+                             instead of a NetworkX graph with colored edges
+            compact (Boolean): Indicates whether the ColoredProductGraph should store its nodes as mixed-radix integer codes (implies split).
+                               Requires the nodes of L[i] to be 0, 1, ..., |V(L[i])| - 1, as in line graphs.
 
         `Returns`:
             product_graph (Graph): A NetworkX graph that contains anchor nodes and all nodes connected to anchor. If the 
@@ -86,56 +277,32 @@ def product_graph_limit(L, anchor_nodes, molecule=False):
 
     """
 
-    def molecule_atom_bond_check(node, dimensions, atom_pair_attributes, bond_type_attributes):
-        """
-            Returns true if the given node agrees on bond types and atom pairs 
-        """
-
-        agree_on_atom_pair = True
-        agree_on_bond_type = True
-        ## set the target value to be the value of the first node
-        target_atom_pair = atom_pair_attributes[0][node[0]]
-        target_bond_type = bond_type_attributes[0][node[0]]
-
-        for i in range(1, dimensions):
-            if atom_pair_attributes[i][node[i]] != target_atom_pair:
-                agree_on_atom_pair = False
-                break
-            if bond_type_attributes[i][node[i]] != target_bond_type:
-                agree_on_bond_type = False
-                break
-
-        return agree_on_atom_pair and agree_on_bond_type
-
-    product_graph = nx.Graph()
-
-    if molecule:
-        atom_pairs = [nx.get_node_attributes(graph, "atom_pair") for graph in L]
-        bond_types = [nx.get_node_attributes(graph, "bond_type") for graph in L]
+    if compact:
+        product_graph = ColoredProductGraph(radices=[len(g.nodes) for g in L])
+    else:
+        product_graph = ColoredProductGraph() if split else nx.Graph()
 
     ## list of node lists
     node_list = [sorted(list(g.nodes)) for g in L]
     n_graphs = len(L)
-    ## Computes the cartesian products of all the node sets of the graphs in L.
-    product_nodes = list(itertools.product(*node_list))
 
-    ## filter product_nodes based on atom_pairs and bond_types if looking at a molecule
-    if molecule:
-        product_nodes = list(filter(lambda node: molecule_atom_bond_check(node, n_graphs, atom_pairs, bond_types), product_nodes))
-        node_count = len(product_nodes)
+    ## If looking at a molecule, only the product nodes agreeing on atom_pairs and bond_types are generated
+    ## A compact graph gets their codes instead, decoding one product node at a time.
+    if molecule and compact:
+        radices = product_graph.radices
+        product_nodes = (decode_product_node(code, radices) for code in map(int, _label_bucketed_product(node_list, _molecule_labels(L), radices)))
+    elif molecule:
+        product_nodes = _label_bucketed_product(node_list, _molecule_labels(L))
     else:
-        ## calculate number of potential nodes in the product graph without filtered for molecule attributes
-        node_count = 1
-        for i in range(n_graphs):
-            node_count = node_count * len(node_list[i])
+        ## Iterates the cartesian products of all the node sets of the graphs in L, without storing them.
+        product_nodes = itertools.product(*node_list)
         
     ## List of vectors. Each vector 'i' specifies which edges in graph L[i] are already included in the anchor.
     anchor_vector = [ [anchor_point[i] for anchor_point in anchor_nodes] for i in range(n_graphs) ]
 
     ## Firstly, nodes are only added if they're in the neighbourhood of any anchor point
     ## and are added based on their edge to an anchor
-    for i in range(node_count):
-        node_i = product_nodes[i]
+    for node_i in product_nodes:
 
         ## check for mixed anchor
         contain_anchor_nodes = False 
@@ -182,8 +349,9 @@ def product_graph_limit(L, anchor_nodes, molecule=False):
                     elif all_agree_disconnected:
                         product_graph.add_edge( node_i, anchor_node, color="red")
 
-    ## Secondly, among all nodes in the neighbourhood, add internal edges
-    added_nodes = list(product_graph.nodes)
+    ## Secondly, among all nodes in the neighbourhood, add internal edges.
+    ## A compact graph decodes the added nodes from their codes whenever they are looked at.
+    added_nodes = product_graph.nodes if compact else list(product_graph.nodes)
     added_nodes_count = len(added_nodes)
 
     ## Add all edges between the nodes that are connected to the anchor
@@ -225,4 +393,358 @@ def product_graph_limit(L, anchor_nodes, molecule=False):
                 elif all_agree_not_adj:
                     product_graph.add_edge( node_i, node_j, color="red")
     
-    return product_graph
\ No newline at end of file
+    return product_graph
+
+class ImplicitProductGraph:
+    """
+    Lazy modular product of the graphs in L. Instead of materializing every node and colored edge,
+    the product graph answers adjacency queries on demand from the adjacency of the graphs in L.
+
+    `L`: The list of (line) graphs the product is taken of.
+
+    `anchor_nodes`: The anchor nodes in the product graph of the form (v_1, v_2, ..., v_n).
+
+    `limit`: If true, the product graph follows product_graph_limit, i.e. nodes mixing anchor and non-anchor
+    coordinates are excluded (and, for molecules, nodes disagreeing on atom pairs/bond types). Otherwise it
+    follows product_graph_no_limit.
+
+    `nodes`: The region of the product graph that neighbourhoods are reported within. Initially only the anchor
+    nodes, see restrict_to and blue_reachable.
+
+    Neighbourhoods within the region are cached for at most `cache_size` nodes (least recently used first out).
+
+    `compact`: If true, common_neighbours returns mixed-radix codes (see encode_product_node) and colored_subgraph
+    builds a compact ColoredProductGraph. Requires the nodes of L[i] to be 0, 1, ..., |V(L[i])| - 1.
+    """
+
+    def __init__(self, L, anchor_nodes, limit=True, molecule=False, cache_size=4096, compact=False):
+        self.L = L
+        self.n_graphs = len(L)
+        self.anchor_nodes = [tuple(anchor) for anchor in anchor_nodes]
+        self.limit = limit
+        self.molecule = molecule and limit
+        self.cache_size = cache_size
+
+        ## adjacency[i][v] is the neighbourhood of v in L[i]
+        self.adjacency = [{node: set(graph.adj[node]) for node in graph.nodes} for graph in L]
+        ## anchor_vector[i] contains the nodes of L[i] that are part of the anchor
+        self.anchor_vector = [set(anchor[i] for anchor in self.anchor_nodes) for i in range(self.n_graphs)]
+        self.labels = _molecule_labels(L) if self.molecule else None
+        self.radices = [len(graph.nodes) for graph in L] if compact else None
+
+        self.nodes = list(self.anchor_nodes)
+        self._region = set(self.nodes)
+        self._neighbourhood_cache = OrderedDict()
+
+    def color(self, u, v):
+        """
+            Returns the color of edge (u, v) following the definition of the modular product, i.e. "blue"
+            if u_i and v_i are adjacent for all i, "red" if u_i and v_i are distinct and non-adjacent for all i, 
+            and None if (u, v) is not an edge.
+        """
+        all_agree_adj = True
+        all_agree_not_adj = True
+        for i in range(self.n_graphs):
+            if u[i] == v[i]:
+                return None
+            if v[i] in self.adjacency[i][u[i]]:
+                all_agree_not_adj = False
+            else:
+                all_agree_adj = False
+            if not all_agree_adj and not all_agree_not_adj:
+                return None
+        return "blue" if all_agree_adj else "red"
+
+    def common_neighbours(self):
+        """
+            Computes the nodes adjacent (by a red or blue edge) to all anchor nodes, without enumerating the product of all node sets.
+
+            For every anchor node the candidates are split on whether they are connected to it by a blue or a red edge. 
+            For a fixed choice of colors, the candidates are a cartesian product of per-coordinate sets: the nodes adjacent
+            (blue) or distinct and non-adjacent (red) to the anchor's coordinate. Choices that leave any coordinate empty are dismissed.
+        """
+        candidates = [set(graph.nodes) for graph in self.L]
+        ## Nodes with a coordinate in the anchor can only be neighbours of the anchor if they are anchor nodes themselves
+        if self.limit:
+            candidates = [candidates[i] - self.anchor_vector[i] for i in range(self.n_graphs)]
+
+        products = []
+        def split_on_anchor(anchor_index, coordinate_sets):
+            if anchor_index == len(self.anchor_nodes):
+                products.append(coordinate_sets)
+                return
+            anchor = self.anchor_nodes[anchor_index]
+            blue_sets = [coordinate_sets[i] & self.adjacency[i][anchor[i]] for i in range(self.n_graphs)]
+            red_sets = [coordinate_sets[i] - self.adjacency[i][anchor[i]] - {anchor[i]} for i in range(self.n_graphs)]
+            for sets in (blue_sets, red_sets):
+                if all(sets):
+                    split_on_anchor(anchor_index + 1, sets)
+
+        split_on_anchor(0, candidates)
+
+        if self.radices is not None:
+            codes = [np.zeros(0, dtype=np.int64)]
+            for coordinate_sets in products:
+                node_list = [sorted(coordinates) for coordinates in coordinate_sets]
+                if self.molecule:
+                    codes.append(_label_bucketed_product(node_list, self.labels, self.radices))
+                else:
+                    codes.append(_product_codes(node_list, self.radices))
+            return np.sort(np.concatenate(codes)).tolist()
+
+        common_neighbours = []
+        for coordinate_sets in products:
+            node_list = [sorted(coordinates) for coordinates in coordinate_sets]
+            if self.molecule:
+                common_neighbours.extend(_label_bucketed_product(node_list, self.labels))
+            else:
+                common_neighbours.extend(itertools.product(*node_list))
+        
+        return sorted(common_neighbours)
+
+    def restrict_to(self, nodes):
+        """
+            Sets the region of the product graph that neighbourhoods are reported within. The anchor nodes are always included.
+        """
+        self.nodes = list(self.anchor_nodes) + [node for node in nodes if node not in self.anchor_nodes]
+        self._region = set(self.nodes)
+        self._neighbourhood_cache.clear()
+
+    def neighbours(self, u):
+        """
+            Returns a dictionary mapping the neighbours of u within the region to the color of their edge to u.
+        """
+        if u in self._neighbourhood_cache:
+            self._neighbourhood_cache.move_to_end(u)
+            return self._neighbourhood_cache[u]
+
+        neighbourhood = {}
+        for v in self.nodes:
+            edge_color = self.color(u, v)
+            if edge_color is not None:
+                neighbourhood[v] = edge_color
+
+        self._neighbourhood_cache[u] = neighbourhood
+        if len(self._neighbourhood_cache) > self.cache_size:
+            self._neighbourhood_cache.popitem(last=False)
+        return neighbourhood
+
+    def blue_reachable(self, nodes):
+        """
+            Returns the given nodes that are reachable from the anchor nodes by blue edges within the anchor nodes and nodes, in
+            the order given. nodes may be tuples or, in compact mode, codes. The region is restricted to nodes, and only the
+            neighbourhoods of the nodes reached are computed.
+        """
+        nodes = list(nodes)
+        coordinates = [decode_product_node(node, self.radices) for node in nodes] if self.radices is not None else nodes
+        self.restrict_to(coordinates)
+
+        reached = set(self.anchor_nodes)
+        frontier = list(self.anchor_nodes)
+        while frontier:
+            u = frontier.pop()
+            for (v, edge_color) in self.neighbours(u).items():
+                if edge_color == "blue" and v not in reached:
+                    reached.add(v)
+                    frontier.append(v)
+
+        return [node for (node, coordinate) in zip(nodes, coordinates) if coordinate in reached]
+
+    def colored_subgraph(self, nodes):
+        """
+            Materializes the subgraph induced by nodes as a ColoredProductGraph. In compact mode, nodes may be given as tuples or codes.
+        """
+        nodes = list(nodes)
+        induced_graph = ColoredProductGraph(radices=self.radices)
+        induced_graph.add_nodes_from(nodes)
+        ## Edge colors are computed on the coordinates, which are decoded once per node
+        coordinates = [induced_graph.nodes[i] for i in range(len(induced_graph.nodes))]
+        for i in range(len(coordinates)):
+            ## Colors within the region are reused from the cached neighbourhoods
+            cached_neighbourhood = self._neighbourhood_cache.get(coordinates[i])
+            for j in range(i + 1, len(coordinates)):
+                if cached_neighbourhood is not None and coordinates[j] in self._region:
+                    edge_color = cached_neighbourhood.get(coordinates[j])
+                else:
+                    edge_color = self.color(coordinates[i], coordinates[j])
+                if edge_color is not None:
+                    induced_graph.add_edge(nodes[i], nodes[j], edge_color)
+        return induced_graph
+
+
+def iter_bits(bits):
+    """
+        Yields the indices of the set bits in the integer bits in increasing order.
+    """
+    while bits:
+        lowest_bit = bits & -bits
+        yield lowest_bit.bit_length() - 1
+        bits ^= lowest_bit
+
+def to_bits(indices):
+    """
+        Computes the bitset (integer) with the bits of all given indices set.
+    """
+    bits = 0
+    for index in indices:
+        bits |= 1 << index
+    return bits
+
+
+class ColoredProductGraph:
+    """
+    Product graph with separate blue and red adjacency. Product nodes are given integer indices in the order
+    they are added, and the blue/red neighbourhoods are bitsets (Python integers) over these indices.
+    Blue-only traversals thereby never look at red edges, and no dictionaries keyed on edges are needed.
+
+    `nodes`: nodes[i] is the product node with index i.
+
+    `index`: Dictionary from product nodes to their index.
+
+    `blue`: blue[i] is the bitset of nodes connected to node i by a blue edge.
+
+    `red`: red[i] is the bitset of nodes connected to node i by a red edge.
+
+    `radices`: If given, the graph is compact: product nodes are stored as mixed-radix codes (see encode_product_node)
+    in the integer array `codes`, `index` is keyed on codes, and nodes[i] decodes the code of node i into its tuple on access.
+    Nodes may then be added either as tuples or as codes.
+
+    While the graph is built, the neighbourhoods are kept as little-endian byte arrays such that
+    adding an edge does not copy a whole bitset. The bitsets are computed once the graph is queried.
+    """
+
+    def __init__(self, radices=None):
+        self.radices = radices
+        if radices is None:
+            self.nodes = []
+        else:
+            self.codes = array("q")
+            self.nodes = _DecodedNodes(self.codes, radices)
+        self.index = {}
+        self._blue_rows = []
+        self._red_rows = []
+        self._blue = None
+        self._red = None
+
+    def key(self, node):
+        """
+            Returns the key of node in `index`, i.e. the node itself or its code in a compact graph.
+        """
+        if self.radices is not None and isinstance(node, tuple):
+            return encode_product_node(node, self.radices)
+        return node
+
+    def index_of(self, node):
+        """
+            Returns the index of node (a tuple, or a code in a compact graph), or None if node is not in the graph.
+        """
+        return self.index.get(self.key(node))
+
+    def add_node(self, node):
+        """
+            Adds node if not already present and returns its index.
+        """
+        key = self.key(node)
+        if key not in self.index:
+            self.index[key] = len(self.index)
+            if self.radices is None:
+                self.nodes.append(key)
+            else:
+                self.codes.append(key)
+            self._blue_rows.append(bytearray())
+            self._red_rows.append(bytearray())
+            self._blue, self._red = None, None
+        return self.index[key]
+
+    def add_nodes_from(self, nodes):
+        for node in nodes:
+            self.add_node(node)
+
+    def add_edge(self, u, v, color):
+        """
+            Adds edge (u, v) with the given color, either "blue" or "red". Nodes are added if not already present.
+        """
+        i, j = self.add_node(u), self.add_node(v)
+        rows = self._blue_rows if color == "blue" else self._red_rows
+        _set_bit(rows[i], j)
+        _set_bit(rows[j], i)
+        self._blue, self._red = None, None
+
+    def set_neighbourhood(self, i, blue_bits, red_bits):
+        """
+            Sets the blue and red neighbourhood of node index i. The caller is responsible for keeping the neighbourhoods symmetric.
+        """
+        self._blue_rows[i] = bytearray(blue_bits.to_bytes((blue_bits.bit_length() + 7) // 8, "little"))
+        self._red_rows[i] = bytearray(red_bits.to_bytes((red_bits.bit_length() + 7) // 8, "little"))
+        self._blue, self._red = None, None
+
+    @property
+    def blue(self):
+        if self._blue is None:
+            self._blue = [int.from_bytes(row, "little") for row in self._blue_rows]
+        return self._blue
+
+    @property
+    def red(self):
+        if self._red is None:
+            self._red = [int.from_bytes(row, "little") for row in self._red_rows]
+        return self._red
+
+    def neighbours(self, i):
+        """
+            Returns the bitset of nodes connected to node index i by an edge of any color.
+        """
+        return self.blue[i] | self.red[i]
+
+    def color(self, i, j):
+        """
+            Returns the color of the edge between node indices i and j, or None if there is no such edge.
+        """
+        if self.blue[i] >> j & 1:
+            return "blue"
+        if self.red[i] >> j & 1:
+            return "red"
+        return None
+
+    def to_networkx(self):
+        """
+            Computes the (uncolored) NetworkX graph with the product node tuples as nodes. Nodes are added in index order and
+            each node lists its neighbours in index order. Apart from the anchors, whose edges product_graph_limit adds first, this is the
+            order of the NetworkX graphs of product_graph_no_limit and product_graph_limit, such that NetworkX algorithms traverse the
+            nodes of N in the same order in both.
+        """
+        product_graph = nx.Graph()
+        product_graph.add_nodes_from(self.nodes)
+        for i in range(len(self.nodes)):
+            node_i = self.nodes[i]
+            product_graph.add_edges_from((node_i, self.nodes[j]) for j in iter_bits(self.neighbours(i) & ~((2 << i) - 1)))
+        return product_graph
+
+
+class _DecodedNodes:
+    """
+    Read-only sequence view decoding the codes of a compact ColoredProductGraph into product node tuples on access.
+    """
+    def __init__(self, codes, radices):
+        self.codes = codes
+        self.radices = radices
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return decode_product_node(self.codes[i], self.radices)
+
+    def __iter__(self):
+        for code in self.codes:
+            yield decode_product_node(code, self.radices)
+
+
+def _set_bit(row, bit):
+    """
+        Sets a bit in a little-endian byte array, growing it as needed.
+    """
+    byte = bit >> 3
+    if byte >= len(row):
+        row.extend(bytes(byte - len(row) + 1))
+    row[byte] |= 1 << (bit & 7)
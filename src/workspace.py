@@ -1,34 +1,21 @@
-import copy
-
 class Workspace:
     """
-    Workspace class for the McGregor algorithm. 
-
+    Workspace class for the McGregor algorithm. A workspace is saved for every node on the current branch, and the
+    workspaces form a trail of the changes made to MARCS, such that MARCS is never copied.
 
-    `MARCS`: A |E1| x |E2| matrix with a 1 in position (r,s) if edge `r` can be mapped to edge `s`
 
     `arcsleft`: An integer value that denotes the number of rows in MARCS that are not all 0s.
 
-    `MARCS_ones_left`: An array of length (rows_in_MARCS) where MARCS_ones_left[i] denotes the number of 1s left in row `i`
-
-    `edges_killed`: An array of integer tuples (r, s) such that all tuples correspond to 'killed' edges that led
-    to the current state of MARCS.
+    `edges_killed`: The cells (r, s) of 'killed' edges that led to the current state of MARCS, as returned by update_MARCS
+    (index arrays of the cells and the number of cells killed per row). Restoring them undoes the mapping of the node.
     """
 
-    def __init__(self, MARCS, arcsleft, MARCS_ones_left, edges_killed):
-        self.MARCS = copy.deepcopy(MARCS)
+    def __init__(self, arcsleft, edges_killed):
         self.arcsleft = arcsleft
-        self.MARCS_ones_left = copy.deepcopy(MARCS_ones_left)
         self.edges_killed = edges_killed
     
-    def get_MARCS(self):
-        return self.MARCS
-    
     def get_arcsleft(self):
         return self.arcsleft
 
-    def get_MARCS_ones_left(self):
-        return self.MARCS_ones_left
-
     def get_edges_killed(self):
-        return self.edges_killed
\ No newline at end of file
+        return self.edges_killed